@@ -9,12 +9,25 @@ import sys
 import json
 import os
 import platform
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import traceback
 import glob
 import subprocess
 import re
 import cmd
+import threading
+import time
+import concurrent.futures
+import contextlib
+import hashlib
+import gzip
+import zlib
+import bisect
+import heapq
+import multiprocessing
+from datetime import datetime
+from array import array
+from collections.abc import Mapping, Sequence
 try:
     import readline
     import atexit
@@ -28,10 +41,21 @@ except:
     print('')
     sys.exit(1)
 
+try: import sqlite3
+except: sqlite3 = None
+
+try: import zstandard
+except: hasZstd = False
+else: hasZstd = True
+
 try: from fuzzywuzzy import fuzz
 except: hasFuzzy = False
 else: hasFuzzy = True
 
+try: import orjson
+except: hasOrjson = False
+else: hasOrjson = True
+
 #--senzing python classes
 try: 
     from G2Database import G2Database
@@ -207,6 +231,1099 @@ class ColoredTable(prettytable.PrettyTable):
             bits.append(self._hrule)
         return "".join(bits)
 
+# ==============================
+class StatsFileSource(object):
+    #--random access to a json statistics file, which may be gzip or zstd compressed
+    #--offsets are into the decompressed json, reading an earlier offset of a compressed file starts it over
+
+    magicNumbers = {b'\x1f\x8b': 'gzip', b'\x28\xb5\x2f\xfd': 'zstd'}
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.compression = None
+        with open(fileName, 'rb') as rawHandle:
+            header = rawHandle.read(4)
+        for magicNumber in self.magicNumbers:
+            if header.startswith(magicNumber):
+                self.compression = self.magicNumbers[magicNumber]
+        if self.compression == 'zstd' and not hasZstd:
+            raise ImportError('Please install python zstandard (pip3 install zstandard) to load %s' % fileName)
+        self.fileHandle = None
+        self.rawHandle = None
+        self.streamOffset = 0
+        self.lock = threading.Lock()
+
+    def openStream(self):
+        #--the decompressed stream and the raw file handle it reads from
+        rawHandle = open(self.fileName, 'rb')
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=rawHandle, mode='rb'), rawHandle
+        elif self.compression == 'zstd':
+            try: return zstandard.ZstdDecompressor().stream_reader(rawHandle, read_across_frames=True), rawHandle
+            except TypeError:
+                return zstandard.ZstdDecompressor().stream_reader(rawHandle), rawHandle
+        return rawHandle, rawHandle
+
+    def readSpan(self, start, end):
+        with self.lock:
+            if not self.compression:
+                if not self.fileHandle:
+                    self.fileHandle, self.rawHandle = self.openStream()
+                self.fileHandle.seek(start)
+                return self.fileHandle.read(end - start)
+
+            if not self.fileHandle or self.streamOffset > start:
+                self.closeStream()
+                self.fileHandle, self.rawHandle = self.openStream()
+                self.streamOffset = 0
+            while self.streamOffset < start:
+                self.readStream(min(start - self.streamOffset, 4194304))
+            return self.readStream(end - start)
+
+    def readStream(self, size):
+        chunkList = []
+        while size > 0:
+            chunk = self.fileHandle.read(size)
+            if not chunk:
+                raise ValueError('unexpected end of file in %s' % self.fileName)
+            chunkList.append(chunk)
+            size -= len(chunk)
+            self.streamOffset += len(chunk)
+        return b''.join(chunkList)
+
+    def closeStream(self):
+        if self.fileHandle:
+            self.fileHandle.close()
+            self.rawHandle.close()
+            self.fileHandle = None
+            self.rawHandle = None
+
+    def close(self):
+        with self.lock:
+            self.closeStream()
+
+# ==============================
+class JsonSpan(object):
+    #--a json array located in the file but not parsed yet
+
+    __slots__ = ('source', 'start', 'end', 'count')
+
+    def __init__(self, source, start, end, count=None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.count = count
+
+    def load(self):
+        return json.loads(self.source.readSpan(self.start, self.end))
+
+# ==============================
+class LazyJsonObject(Mapping):
+    #--a json object whose arrays are only parsed the first time they are accessed
+
+    def __init__(self, key, members):
+        self.key = key
+        self._members = members
+
+    def __getitem__(self, key):
+        value = self._members[key]
+        if type(value) == JsonSpan:
+            value = value.load()
+            if isSampleListKey(key, self.key):
+                value = compactSampleList(value)
+            self._members[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, key):
+        #--Mapping's own __contains__ would get the member and so parse it
+        return key in self._members
+
+    def peek(self, key):
+        #--a member for a single pass, an array it parses is not kept
+        value = self._members[key]
+        if type(value) == JsonSpan:
+            return value.load()
+        return value
+
+    def itemCount(self, key):
+        value = self._members[key]
+        if type(value) == JsonSpan and value.count is not None:
+            return value.count
+        return len(self[key])
+
+# ==============================
+class JsonIndexScanner(object):
+    #--one pass over a json statistics file that indexes its objects and skips over its other arrays
+    #--so the large sample lists are never parsed until browsed
+
+    wsPattern = re.compile(rb'[ \t\n\r]*')
+    contentPattern = re.compile(rb'[^ \t\n\r]')
+    stringPattern = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+    scalarPattern = re.compile(rb'[-+0-9.eE]+|true|false|null')
+    structurePattern = re.compile(rb'["\[\]{}]')
+    complexPattern = re.compile(rb'[\[{}\\]')
+
+    def __init__(self, source, chunkSize = 4194304, progress = None):
+        self.source = source
+        self.chunkSize = chunkSize
+        self.progress = progress
+        self.bytesRead = 0
+
+    def scan(self):
+        self.buf = b''
+        self.bufOffset = 0
+        self.pos = 0
+        self.eof = False
+        self.stream, self.rawHandle = self.source.openStream()
+        try:
+            if self.peek() != b'{':
+                raise ValueError('%s is not a json object' % self.source.fileName)
+            return self.scanObject(None)
+        finally:
+            self.stream.close()
+            self.rawHandle.close()
+
+    def offset(self):
+        return self.bufOffset + self.pos
+
+    def fill(self):
+        chunk = self.stream.read(self.chunkSize)
+        if not chunk:
+            self.eof = True
+            return False
+        self.bytesRead += len(chunk)
+        if self.progress is not None:
+            self.progress['done'] = self.rawHandle.tell()
+        self.bufOffset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = self.wsPattern.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                return b''
+
+    def matchToken(self, pattern):
+        while True:
+            match = pattern.match(self.buf, self.pos)
+            if match and match.end() > self.pos and (match.end() < len(self.buf) or self.eof):
+                self.pos = match.end()
+                return match.group()
+            if self.eof or not self.fill():
+                raise ValueError('invalid json at offset %s' % self.offset())
+
+    def scanValue(self, key):
+        char = self.peek()
+        if char == b'{':
+            return self.scanObject(key)
+        elif char == b'[':
+            return self.scanArray(key)
+        elif char == b'"':
+            return json.loads(self.matchToken(self.stringPattern))
+        elif char:
+            return json.loads(self.matchToken(self.scalarPattern))
+        raise ValueError('unexpected end of file')
+
+    def scanObject(self, key):
+        self.pos += 1
+        members = {}
+        while True:
+            char = self.peek()
+            if char == b'}':
+                self.pos += 1
+                return LazyJsonObject(key, members)
+            elif char == b',':
+                self.pos += 1
+            elif char == b'"':
+                memberKey = json.loads(self.matchToken(self.stringPattern))
+                if self.peek() != b':':
+                    raise ValueError('invalid json at offset %s' % self.offset())
+                self.pos += 1
+                members[memberKey] = self.scanValue(memberKey)
+            else:
+                raise ValueError('invalid json at offset %s' % self.offset())
+
+    def scanArray(self, key):
+        start = self.offset()
+        self.pos += 1
+
+        #--only arrays of objects are indexed, anything else is a sample list
+        if self.peek() != b'{':
+            count = self.skipArray()
+            return JsonSpan(self.source, start, self.offset(), count)
+
+        items = []
+        while True:
+            char = self.peek()
+            if char == b']':
+                self.pos += 1
+                return items
+            elif char == b',':
+                self.pos += 1
+            elif char:
+                items.append(self.scanValue(key))
+            else:
+                raise ValueError('unexpected end of file')
+
+    def skipArray(self):
+        #--moves past the current array, returns its item count if it came for free
+        depth = 1
+        commas = 0
+        quotes = 0
+        counted = True
+        hasContent = False
+        while True:
+
+            #--fast path: a run of numbers and plain strings up to the next close bracket is skipped in C
+            close = self.buf.find(b']', self.pos)
+            limit = close if close >= 0 else len(self.buf)
+            if not self.complexPattern.search(self.buf, self.pos, limit):
+                regionQuotes = self.buf.count(b'"', self.pos, limit)
+                if regionQuotes % 2 == 1 and close < 0:
+                    limit = self.buf.rfind(b'"', self.pos, limit)
+                    regionQuotes -= 1
+                if regionQuotes % 2 == 0:
+                    commas += self.buf.count(b',', self.pos, limit)
+                    quotes += regionQuotes
+                    if not hasContent:
+                        hasContent = self.contentPattern.search(self.buf, self.pos, limit) is not None
+                    self.pos = limit
+                    if self.pos == close:
+                        self.pos += 1
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    elif not self.fill():
+                        raise ValueError('unexpected end of file')
+                    continue
+
+            #--slow path: one token at a time through nested structures, escapes and brackets inside strings
+            counted = False
+            match = self.structurePattern.search(self.buf, self.pos)
+            if not match:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise ValueError('unexpected end of file')
+                continue
+            self.pos = match.start()
+            char = match.group()
+            if char == b'"':
+                match = self.stringPattern.match(self.buf, self.pos)
+                if match:
+                    self.pos = match.end()
+                elif not self.fill():
+                    raise ValueError('unexpected end of file')
+                continue
+            self.pos += 1
+            if char in (b'[', b'{'):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    break
+
+        if not counted:
+            return None
+        if not hasContent:
+            return 0
+        if quotes == 0 or quotes == 2 * (commas + 1):
+            return commas + 1
+        return None
+
+# ==============================
+class EntityPairArray(Sequence):
+    #--sample pairs kept as two arrays of entity ids rather than "id1 id2" strings
+
+    def __init__(self, firstIds, secondIds):
+        self.firstIds = firstIds
+        self.secondIds = secondIds
+
+    def __len__(self):
+        return len(self.firstIds)
+
+    def __getitem__(self, index):
+        if type(index) == slice:
+            return EntityPairArray(self.firstIds[index], self.secondIds[index])
+        return (self.firstIds[index], self.secondIds[index])
+
+# ==============================
+class CachedJsonObject(LazyJsonObject):
+    #--a json object stored in a StatsFileCache, its members are read on first access
+
+    def __init__(self, cache, nodeId, key):
+        self.cache = cache
+        self.nodeId = nodeId
+        self.key = key
+        self.loadedMembers = None
+
+    @property
+    def _members(self):
+        if self.loadedMembers is None:
+            self.loadedMembers = self.cache.loadMembers(self.nodeId, self.key)
+        return self.loadedMembers
+
+    def peek(self, key):
+        #--a list of its own so the pages read for a single pass go with it rather than staying in the member's page cache
+        value = self._members[key]
+        if type(value) == PagedJsonList:
+            return PagedJsonList(value.cache, value.nodeId, value.count, value.compact)
+        return value
+
+# ==============================
+class PagedJsonList(Sequence):
+    #--a sample list stored in a StatsFileCache, only the pages being browsed are read
+    #--the review loop and its prefetch worker share it so its pages are only touched under a lock
+
+    pagesKept = 8
+
+    def __init__(self, cache, nodeId, count, compact = False):
+        self.cache = cache
+        self.nodeId = nodeId
+        self.count = count
+        self.compact = compact
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if type(index) == slice:
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError('list index out of range')
+        pageNo, pageIndex = divmod(index, self.cache.pageSize)
+        with self.lock:
+            if pageNo in self.pages:
+                self.pages.move_to_end(pageNo)
+                return self.pages[pageNo][pageIndex]
+        pageItems = self.cache.loadPage(self.nodeId, pageNo)
+        pageItems = compactSampleList(pageItems) if self.compact else pageItems
+        with self.lock:
+            self.pages[pageNo] = pageItems
+            self.pages.move_to_end(pageNo)
+            if len(self.pages) > self.pagesKept:
+                self.pages.popitem(last=False)
+        return pageItems[pageIndex]
+
+# ==============================
+class EntitySizeIndex(object):
+    #--the size breakdown sorted by size with the buckets holding each review reason
+    #--only the counts are read, the entity lists are left to the SampleCursor
+
+    def __init__(self, sizeBreakdown):
+        bucketList = []
+        for position, entitySizeData in enumerate(sizeBreakdown):
+            reasonCounts = OrderedDict()
+            reviewReasons = entitySizeData.get('REVIEW_REASONS') or {}
+            for reviewReason in reviewReasons:
+                reasonCounts[reviewReason] = jsonItemCount(reviewReasons, reviewReason)
+            sampleCount = jsonItemCount(entitySizeData, 'SAMPLE_ENTITIES') if 'SAMPLE_ENTITIES' in entitySizeData else 0
+            bucketList.append((entitySizeData['ENTITY_SIZE'], position, entitySizeData, sampleCount, reasonCounts))
+
+        self.buckets = sorted(bucketList, key=lambda k: (k[0], k[1]))
+        self.sizes = [bucket[0] for bucket in self.buckets]
+        self.reasonPostings = {}
+        for bucketNo in range(len(self.buckets)):
+            for reviewReason in self.buckets[bucketNo][4]:
+                self.reasonPostings.setdefault(reviewReason, []).append(bucketNo)
+
+    def bucketPieces(self, bucketNo, reviewOnly, reviewReason):
+        entitySize, position, entitySizeData, sampleCount, reasonCounts = self.buckets[bucketNo]
+        if not reviewOnly:
+            return [(entitySizeData, 'SAMPLE_ENTITIES', sampleCount, entitySize, None)] if sampleCount else []
+        pieceList = []
+        for thisReason in reasonCounts:
+            if reasonCounts[thisReason] and (not reviewReason or reviewReason in thisReason):
+                pieceList.append((entitySizeData['REVIEW_REASONS'], thisReason, reasonCounts[thisReason], entitySize, thisReason))
+        return pieceList
+
+    def select(self, sign, size, reviewOnly = False, reviewReason = ''):
+        #--a SampleCursor in the order the entitySizeBreakdown command has always listed them
+
+        if not reviewOnly:
+            candidates = None
+        else:
+            candidates = set()
+            for thisReason in self.reasonPostings:
+                if not reviewReason or reviewReason in thisReason:
+                    candidates.update(self.reasonPostings[thisReason])
+
+        def piecesInRange(low, high):
+            bucketList = [bucketNo for bucketNo in range(low, high) if candidates is None or bucketNo in candidates]
+            bucketList.sort(key=lambda k: self.buckets[k][1])
+            return [(bucketNo, self.bucketPieces(bucketNo, reviewOnly, reviewReason)) for bucketNo in bucketList]
+
+        #--an exact size match wins for =, >= and <=
+        if sign in ('=', '>=', '<='):
+            for bucketNo, pieceList in piecesInRange(bisect.bisect_left(self.sizes, size), bisect.bisect_right(self.sizes, size)):
+                if pieceList:
+                    return EntitySizeCursor(pieceList, reviewOnly)
+
+        selectedPieces = []
+        if sign in ('<', '<='):
+            for bucketNo, pieceList in reversed(piecesInRange(0, bisect.bisect_left(self.sizes, size))):
+                selectedPieces.extend(pieceList)
+        elif sign in ('>', '>='):
+            for bucketNo, pieceList in piecesInRange(bisect.bisect_right(self.sizes, size), len(self.sizes)):
+                selectedPieces.extend(pieceList)
+        return EntitySizeCursor(selectedPieces, reviewOnly)
+
+# ==============================
+class SampleCursor(Sequence):
+    #--a run of sample lists read as one list, each piece is (container, key, count, ...)
+
+    def __init__(self, pieceList):
+        self.pieceList = pieceList
+        self.offsets = []
+        self.count = 0
+        for piece in pieceList:
+            self.offsets.append(self.count)
+            self.count += piece[2]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError('sample index out of range')
+        pieceNo = bisect.bisect_right(self.offsets, index) - 1
+        piece = self.pieceList[pieceNo]
+        return self.makeRecord(piece, piece[0][piece[1]][index - self.offsets[pieceNo]])
+
+    def makeRecord(self, piece, item):
+        return item
+
+# ==============================
+class EntitySizeCursor(SampleCursor):
+    #--the entities selected from the size index, made into review records as they are visited
+
+    def __init__(self, pieceList, reviewOnly):
+        SampleCursor.__init__(self, pieceList)
+        self.reviewOnly = reviewOnly
+
+    def makeRecord(self, piece, item):
+        container, key, itemCount, entitySize, reviewReason = piece
+        return {"entity_id": str(item), "entity_size": entitySize, "review_only": self.reviewOnly, "review_reason": reviewReason}
+
+# ==============================
+class AuditCategoryIndex(object):
+    #--the largest sub-categories of an audit category with the rest grouped as OTHERS
+
+    topCount = 10
+
+    def __init__(self, subCategoryData):
+        self.subCategoryData = subCategoryData
+        subCategoryCounts = OrderedDict()
+        for subCategory in subCategoryData:
+            subCategoryCounts[subCategory] = subCategoryData[subCategory]['COUNT']
+
+        self.subCategoryList = []
+        for subCategory in heapq.nlargest(self.topCount, subCategoryCounts, key=lambda x: subCategoryCounts[x]):
+            self.subCategoryList.append({'INDEX': len(self.subCategoryList) + 1, 'NAME': subCategory, 'LIST': set([subCategory]), 'COUNT': subCategoryCounts[subCategory]})
+        if len(subCategoryCounts) > self.topCount:
+            otherList = set(subCategoryCounts) - set([x['NAME'] for x in self.subCategoryList])
+            self.subCategoryList.append({'INDEX': self.topCount + 1, 'NAME': 'OTHERS', 'LIST': otherList, 'COUNT': sum([subCategoryCounts[x] for x in otherList])})
+
+    def findSubCategory(self, argValue):
+        #--position of a sub-category by index or name, -1 if not found
+        if argValue.isdigit() and int(argValue) >= 1 and int(argValue) <= len(self.subCategoryList):
+            return int(argValue) - 1
+        for i in range(len(self.subCategoryList)):
+            if argValue.upper() == self.subCategoryList[i]['NAME'].upper():
+                return i
+        return -1
+
+    def samples(self, subCategoryIndex):
+        #--a SampleCursor over the sub-categories' sample lists in file order
+        subCategorySet = self.subCategoryList[subCategoryIndex]['LIST']
+        if len(subCategorySet) == 1:
+            subCategoryNames = list(subCategorySet)
+        else:
+            subCategoryNames = [x for x in self.subCategoryData if x in subCategorySet]
+        pieceList = []
+        for subCategory in subCategoryNames:
+            if 'SAMPLE' in self.subCategoryData[subCategory]:
+                pieceList.append((self.subCategoryData[subCategory], 'SAMPLE', jsonItemCount(self.subCategoryData[subCategory], 'SAMPLE')))
+        return SampleCursor(pieceList)
+
+# ==============================
+class StatsFileCache(object):
+    #--indexed sqlite copy of a json statistics file so later sessions can skip the json scan
+    #--keyed by the full path and only used while the file has the same modification time and size
+
+    formatVersion = '2'
+    pageSize = 1000
+
+    def __init__(self, fileName):
+        self.fileName = os.path.abspath(fileName)
+        fileStat = os.stat(self.fileName)
+        self.signature = {'SOURCE_PATH': self.fileName, 'SOURCE_MTIME': repr(fileStat.st_mtime), 'SOURCE_SIZE': str(fileStat.st_size), 'FORMAT_VERSION': self.formatVersion}
+        self.cacheDir = statsCacheDir()
+        self.cacheFileName = os.path.join(self.cacheDir, hashlib.sha1(self.fileName.encode('utf-8')).hexdigest() + '.db')
+        self.dbo = None
+        self.source = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        #--None if there is no current sidecar for the file
+        if not os.path.exists(self.cacheFileName):
+            return None
+        dbo = sqlite3.connect(self.cacheFileName, check_same_thread=False)
+        try: metaData = dict(dbo.execute('select NAME, VALUE from META').fetchall())
+        except sqlite3.Error:
+            metaData = {}
+        for name in self.signature:
+            if metaData.get(name) != self.signature[name]:
+                dbo.close()
+                return None
+        self.dbo = dbo
+        #--opening it counts as a use so the sidecars of files still being loaded are the last to be evicted
+        try: os.utime(self.cacheFileName)
+        except OSError: pass
+        return CachedJsonObject(self, int(metaData['ROOT_ID']), None)
+
+    def outline(self, value):
+        #--the objects of the index with its sample lists still unread, so build never sees one parsed while browsing
+        if isinstance(value, LazyJsonObject):
+            return LazyJsonObject(value.key, {key: self.outline(value._members[key]) for key in value._members})
+        elif type(value) == list:
+            return [self.outline(item) for item in value]
+        return value
+
+    def build(self, jsonData, maxBytes):
+        #--writes the sidecar then evicts the oldest until the cache fits in maxBytes
+        #--the sample lists are read through a file handle of its own
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+        #--each build has its own temp file so two building the same sidecar never write into each other's
+        tempFileName = '%s.%s-%s.tmp' % (self.cacheFileName, os.getpid(), threading.get_ident())
+        if os.path.exists(tempFileName):
+            os.remove(tempFileName)
+        dbo = sqlite3.connect(tempFileName)
+        self.source = StatsFileSource(self.fileName)
+        try:
+            dbo.execute('pragma journal_mode = off')
+            dbo.execute('pragma synchronous = off')
+            dbo.execute('create table META (NAME text primary key, VALUE text)')
+            dbo.execute('create table NODE (NODE_ID integer primary key, PARENT_ID integer, SEQ integer, KEY text, KIND text, VALUE text, ITEM_COUNT integer)')
+            dbo.execute('create index NODE_PARENT on NODE (PARENT_ID, SEQ)')
+            dbo.execute('create table PAGE (NODE_ID integer, PAGE_NO integer, ITEMS blob, primary key (NODE_ID, PAGE_NO))')
+            rootId = self.writeNode(dbo, None, 0, None, jsonData)
+            dbo.executemany('insert into META values (?, ?)', list(self.signature.items()) + [('ROOT_ID', str(rootId))])
+            dbo.commit()
+        except:
+            dbo.close()
+            os.remove(tempFileName)
+            raise
+        finally:
+            self.source.close()
+        dbo.close()
+        os.replace(tempFileName, self.cacheFileName)
+        self.evict(maxBytes)
+
+    def evict(self, maxBytes):
+        #--least recently opened first, temp files of interrupted builds once a day old
+        fileList = []
+        for fileName in glob.glob(os.path.join(self.cacheDir, '*')):
+            try: fileStat = os.stat(fileName)
+            except OSError:
+                continue
+            if fileName.endswith('.tmp'):
+                #--left by a session that exited part way through a build
+                if fileStat.st_mtime < time.time() - 86400:
+                    try: os.remove(fileName)
+                    except OSError: pass
+                continue
+            fileList.append((fileStat.st_mtime, fileStat.st_size, fileName))
+
+        totalBytes = sum([fileSize for fileTime, fileSize, fileName in fileList])
+        for fileTime, fileSize, fileName in sorted(fileList):
+            if totalBytes <= maxBytes:
+                break
+            try: os.remove(fileName)
+            except OSError:
+                continue
+            totalBytes -= fileSize
+
+    def writeNode(self, dbo, parentId, seq, key, value):
+        if isinstance(value, LazyJsonObject):
+            nodeId = dbo.execute('insert into NODE (PARENT_ID, SEQ, KEY, KIND) values (?, ?, ?, ?)', [parentId, seq, key, 'O']).lastrowid
+            members = value._members
+            for memberSeq, memberKey in enumerate(members):
+                self.writeNode(dbo, nodeId, memberSeq, memberKey, members[memberKey])
+        elif type(value) == list:
+            nodeId = dbo.execute('insert into NODE (PARENT_ID, SEQ, KEY, KIND) values (?, ?, ?, ?)', [parentId, seq, key, 'A']).lastrowid
+            for itemSeq in range(len(value)):
+                self.writeNode(dbo, nodeId, itemSeq, key, value[itemSeq])
+        elif type(value) == JsonSpan:
+            items = json.loads(self.source.readSpan(value.start, value.end))
+            nodeId = dbo.execute('insert into NODE (PARENT_ID, SEQ, KEY, KIND, ITEM_COUNT) values (?, ?, ?, ?, ?)', [parentId, seq, key, 'L', len(items)]).lastrowid
+            pageList = []
+            for pageNo in range(0, (len(items) + self.pageSize - 1) // self.pageSize):
+                pageList.append([nodeId, pageNo, zlib.compress(json.dumps(items[pageNo * self.pageSize:(pageNo + 1) * self.pageSize]).encode('utf-8'))])
+            dbo.executemany('insert into PAGE values (?, ?, ?)', pageList)
+        else:
+            nodeId = dbo.execute('insert into NODE (PARENT_ID, SEQ, KEY, KIND, VALUE) values (?, ?, ?, ?, ?)', [parentId, seq, key, 'S', json.dumps(value)]).lastrowid
+        return nodeId
+
+    def loadMembers(self, nodeId, parentKey):
+        with self.lock:
+            rowList = self.dbo.execute('select NODE_ID, KEY, KIND, VALUE, ITEM_COUNT from NODE where PARENT_ID = ? order by SEQ', [nodeId]).fetchall()
+        members = {}
+        for childId, key, kind, value, itemCount in rowList:
+            members[key] = self.nodeValue(childId, key, kind, value, itemCount, parentKey)
+        return members
+
+    def loadItems(self, nodeId, parentKey):
+        with self.lock:
+            rowList = self.dbo.execute('select NODE_ID, KEY, KIND, VALUE, ITEM_COUNT from NODE where PARENT_ID = ? order by SEQ', [nodeId]).fetchall()
+        return [self.nodeValue(*(row + (parentKey,))) for row in rowList]
+
+    def nodeValue(self, nodeId, key, kind, value, itemCount, parentKey):
+        if kind == 'O':
+            return CachedJsonObject(self, nodeId, key)
+        elif kind == 'A':
+            return self.loadItems(nodeId, parentKey)
+        elif kind == 'L':
+            return PagedJsonList(self, nodeId, itemCount, isSampleListKey(key, parentKey))
+        return json.loads(value)
+
+    def loadPage(self, nodeId, pageNo):
+        with self.lock:
+            rowData = self.dbo.execute('select ITEMS from PAGE where NODE_ID = ? and PAGE_NO = ?', [nodeId, pageNo]).fetchone()
+        return json.loads(zlib.decompress(rowData[0]).decode('utf-8'))
+
+# ==============================
+class EntityCache(object):
+    #--least recently used cache of engine responses bounded by their total size
+    #--responses are kept as the json the engine returned as callers modify what they parse
+
+    def __init__(self, maxBytes = 67108864, ttlSeconds = None):
+        self.maxBytes = maxBytes
+        self.ttlSeconds = ttlSeconds
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+        self.configId = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, cacheKey):
+        with self.lock:
+            if cacheKey in self.entries:
+                response, storedTime = self.entries[cacheKey]
+                if self.ttlSeconds is None or time.time() - storedTime <= self.ttlSeconds:
+                    self.entries.move_to_end(cacheKey)
+                    self.hits += 1
+                    return response
+                del self.entries[cacheKey]
+                self.totalBytes -= len(response)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, cacheKey, response):
+        with self.lock:
+            if cacheKey in self.entries:
+                self.totalBytes -= len(self.entries.pop(cacheKey)[0])
+            if len(response) > self.maxBytes:
+                return
+            self.entries[cacheKey] = (response, time.time())
+            self.totalBytes += len(response)
+            while self.totalBytes > self.maxBytes:
+                self.totalBytes -= len(self.entries.popitem(last=False)[1][0])
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.totalBytes = 0
+
+    def checkConfig(self, configId):
+        #--responses resolved under another config are no longer valid
+        if configId is None or configId == self.configId:
+            return
+        if self.configId is not None and self.entries:
+            self.invalidations += 1
+            self.clear()
+        self.configId = configId
+
+# ==============================
+class SamplePrefetcher(object):
+    #--fetches the entities of the next few samples on a worker thread while the current one is reviewed
+    #--sampleEntities(index, dbo) is called with the worker's own connection so they never share a cursor
+
+    def __init__(self, shell, sampleCount, sampleEntities, window = 3, fetchWhy = False, needsDatabase = False, fetchEntities = True):
+        self.shell = shell
+        self.sampleCount = sampleCount
+        self.sampleEntities = sampleEntities
+        self.window = window
+        self.fetchWhy = fetchWhy
+        self.needsDatabase = needsDatabase
+        self.fetchEntities = fetchEntities
+        self.resolved = {}
+        self.attempted = set()
+        self.position = 0
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.thread = None
+        if self.window > 0 and self.sampleCount > 1 and (self.fetchEntities or self.fetchWhy):
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def entityIds(self, index):
+        #--moves the window to this sample, the worker may have resolved it already
+        with self.condition:
+            self.position = index
+            self.attempted.add(index)
+            self.condition.notify()
+            if index in self.resolved:
+                return self.resolved[index]
+        entityIds = self.sampleEntities(index, g2Dbo)
+        with self.condition:
+            self.resolved[index] = entityIds
+        return entityIds
+
+    def cancel(self):
+        #--the worker stops after its current call, the review loop does not wait for it
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify()
+
+    def nextIndex(self):
+        for index in range(self.position + 1, min(self.position + self.window + 1, self.sampleCount)):
+            if index not in self.attempted:
+                return index
+        return None
+
+    def run(self):
+        dbo = None
+        if self.needsDatabase:
+            try: dbo = g2DbPool.checkout()
+            except:
+                return
+        try:
+            while True:
+                with self.condition:
+                    while not self.cancelled and self.nextIndex() is None:
+                        self.condition.wait()
+                    if self.cancelled:
+                        return
+                    index = self.nextIndex()
+                    self.attempted.add(index)
+                self.prefetch(index, dbo)
+        finally:
+            if dbo:
+                g2DbPool.checkin(dbo)
+
+    def prefetch(self, index, dbo):
+        #--any error is left for the review loop to report when it gets to this sample
+        try: entityIds = self.sampleEntities(index, dbo)
+        except:
+            return
+        with self.condition:
+            self.resolved.setdefault(index, entityIds)
+        #--a single entity is shown by get and more than one by compare, both without relationships when alone
+        entityCalls = []
+        if self.fetchEntities:
+            entityCalls.append(self.shell.entityProfile('RECORDS' if len(entityIds) == 1 else 'COMPARE'))
+        if self.fetchWhy:
+            entityCalls.append(('whyEntityByEntityID', None))
+        for entityId in entityIds:
+            for apiName, flags in entityCalls:
+                if self.cancelled:
+                    return
+                try: self.shell.fetchEntity(apiName, entityId, flags)
+                except:
+                    pass
+
+# ==============================
+class EngineStats(object):
+    #--call counts, latency histograms and response sizes of the engine apis and the time spent parsing their json
+    #--the seconds of the current command are summed across threads to split it into engine, json and the rest
+
+    bucketLimits = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, None]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.traceFile = None
+        self.traceFileName = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.apiStats = OrderedDict()
+            self.jsonCount = 0
+            self.jsonSeconds = 0.0
+            self.jsonBytes = 0
+            self.commandLine = None
+            self.commandStart = None
+            self.commandEngineSeconds = 0.0
+            self.commandEngineCalls = 0
+            self.commandJsonSeconds = 0.0
+            self.lastCommand = None
+
+    def recordCall(self, apiName, seconds, responseBytes, errorText = None, callArgs = None):
+        with self.lock:
+            if apiName not in self.apiStats:
+                self.apiStats[apiName] = {'CALLS': 0, 'ERRORS': 0, 'SECONDS': 0.0, 'MAX_SECONDS': 0.0, 'BYTES': 0, 'MAX_BYTES': 0, 'HISTOGRAM': [0] * len(self.bucketLimits)}
+            apiStat = self.apiStats[apiName]
+            apiStat['CALLS'] += 1
+            apiStat['ERRORS'] += 1 if errorText else 0
+            apiStat['SECONDS'] += seconds
+            apiStat['MAX_SECONDS'] = max(apiStat['MAX_SECONDS'], seconds)
+            apiStat['BYTES'] += responseBytes
+            apiStat['MAX_BYTES'] = max(apiStat['MAX_BYTES'], responseBytes)
+            bucketIndex = 0
+            while self.bucketLimits[bucketIndex] is not None and 1000 * seconds > self.bucketLimits[bucketIndex]:
+                bucketIndex += 1
+            apiStat['HISTOGRAM'][bucketIndex] += 1
+            if self.commandStart is not None:
+                self.commandEngineSeconds += seconds
+                self.commandEngineCalls += 1
+            if self.traceFile:
+                traceRecord = OrderedDict()
+                traceRecord['TIME'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+                traceRecord['COMMAND'] = self.commandLine
+                traceRecord['THREAD'] = threading.current_thread().name
+                traceRecord['API'] = apiName
+                traceRecord['ARGS'] = [x if isinstance(x, int) else str(x)[:250] for x in (callArgs or [])]
+                traceRecord['MS'] = round(1000 * seconds, 3)
+                traceRecord['BYTES'] = responseBytes
+                if errorText:
+                    traceRecord['ERROR'] = errorText
+                self.traceFile.write(json.dumps(traceRecord) + '\n')
+                self.traceFile.flush()
+
+    def recordJson(self, seconds, jsonBytes):
+        with self.lock:
+            self.jsonCount += 1
+            self.jsonSeconds += seconds
+            self.jsonBytes += jsonBytes
+            if self.commandStart is not None:
+                self.commandJsonSeconds += seconds
+
+    def startCommand(self, line):
+        with self.lock:
+            self.commandLine = line
+            self.commandStart = time.time()
+            self.commandEngineSeconds = 0.0
+            self.commandEngineCalls = 0
+            self.commandJsonSeconds = 0.0
+
+    def endCommand(self):
+        with self.lock:
+            if self.commandStart is None:
+                return
+            if self.commandLine.split() and self.commandLine.split()[0] != 'engineStats':
+                self.lastCommand = {'COMMAND': self.commandLine, 'SECONDS': time.time() - self.commandStart, 'ENGINE_SECONDS': self.commandEngineSeconds, 'ENGINE_CALLS': self.commandEngineCalls, 'JSON_SECONDS': self.commandJsonSeconds}
+            self.commandLine = None
+            self.commandStart = None
+
+    def percentile(self, apiName, pct):
+        #--upper limit in ms of the bucket holding the percentile, None if past the last one
+        apiStat = self.apiStats[apiName]
+        rank = apiStat['CALLS'] * pct / 100
+        callCount = 0
+        for bucketIndex in range(len(self.bucketLimits)):
+            callCount += apiStat['HISTOGRAM'][bucketIndex]
+            if callCount >= rank:
+                return self.bucketLimits[bucketIndex]
+        return None
+
+    def setTrace(self, fileName):
+        with self.lock:
+            if self.traceFile:
+                self.traceFile.close()
+            self.traceFile = open(fileName, 'a') if fileName else None
+            self.traceFileName = fileName
+
+#--shared by the shell and jsonDecode
+engineStats = EngineStats()
+
+# ==============================
+class LibFeatCache(object):
+    #--bounded least recently used cache of LIB_FEAT rows shared by why and audit
+    #--a feature id always describes the same feature so entries never expire
+
+    def __init__(self, maxEntries = 100000):
+        self.maxEntries = maxEntries
+        self.lock = threading.Lock()
+        self.features = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.features)
+
+    def clear(self):
+        with self.lock:
+            self.features.clear()
+
+    def getFeatures(self, dbo, libFeatIdList, withElements = False, chunkSize = 500):
+        #--LIB_FEAT rows keyed by id, the misses are fetched a chunk of ids per query
+        featureDict = {}
+        missingList = []
+        with self.lock:
+            for libFeatId in OrderedDict.fromkeys([int(x) for x in libFeatIdList]):
+                libFeature = self.features.get(libFeatId)
+                if libFeature and (not withElements or 'FELEM_VALUES' in libFeature):
+                    self.features.move_to_end(libFeatId)
+                    featureDict[libFeatId] = libFeature
+                    self.hits += 1
+                else:
+                    missingList.append(libFeatId)
+                    self.misses += 1
+
+        sql = 'select LIB_FEAT_ID, FTYPE_ID, FEAT_DESC%s from LIB_FEAT where LIB_FEAT_ID in (%%s)' % (', FELEM_VALUES' if withElements else '')
+        for i in range(0, len(missingList), chunkSize):
+            chunkList = missingList[i:i + chunkSize]
+            for rowData in dbo.fetchAllDicts(dbo.sqlExec(sql % ','.join(['?'] * len(chunkList)), chunkList)):
+                featureDict[int(rowData['LIB_FEAT_ID'])] = rowData
+
+        with self.lock:
+            for libFeatId in missingList:
+                if libFeatId in featureDict:
+                    self.features[libFeatId] = featureDict[libFeatId]
+                    self.features.move_to_end(libFeatId)
+            while len(self.features) > self.maxEntries:
+                self.features.popitem(last=False)
+                self.evictions += 1
+        return featureDict
+
+#--shared by every thread that looks up feature descriptions
+libFeatCache = LibFeatCache()
+
+# ==============================
+class PooledDatabase(object):
+    #--a connection checked out of a G2DatabasePool, with the same sql calls as g2Dbo
+
+    def __init__(self, dbUri):
+        self.dbo = G2Database(dbUri)
+        self.success = self.dbo.success
+        self.lastUsed = time.time()
+
+    def sqlExec(self, sql, parmList = None):
+        return self.dbo.sqlExec(sql, parmList) if parmList is not None else self.dbo.sqlExec(sql)
+
+    def fetchNext(self, cursor):
+        return self.dbo.fetchNext(cursor)
+
+    def fetchAllRows(self, cursor):
+        return self.dbo.fetchAllRows(cursor)
+
+    def fetchAllDicts(self, cursor):
+        return self.dbo.fetchAllDicts(cursor)
+
+    def isHealthy(self):
+        try: self.dbo.fetchAllRows(self.dbo.sqlExec('select 1 from DSRC_RECORD where 1 = 0'))
+        except:
+            return False
+        return True
+
+    def close(self):
+        try: self.dbo.close()
+        except: pass
+
+# ==============================
+class G2DatabasePool(object):
+    #--database connections the worker threads check out so their sql runs in parallel
+    #--opened on demand up to maxConnections, health checked when idle or after an error
+
+    def __init__(self, dbUri, maxConnections = 8, healthCheckSeconds = 60, checkoutTimeout = 60):
+        self.dbUri = dbUri
+        self.maxConnections = maxConnections
+        self.healthCheckSeconds = healthCheckSeconds
+        self.checkoutTimeout = checkoutTimeout
+        self.condition = threading.Condition()
+        self.idle = []
+        self.openCount = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.replaced = 0
+
+    def checkout(self):
+        #--a healthy connection, raises an exception if none can be opened or freed in time
+        with self.condition:
+            self.checkouts += 1
+            if not self.idle and self.openCount >= self.maxConnections:
+                self.waits += 1
+                if not self.condition.wait_for(lambda: self.idle or self.openCount < self.maxConnections, self.checkoutTimeout):
+                    raise Exception('no database connection free after %s seconds' % self.checkoutTimeout)
+            dbo = self.idle.pop() if self.idle else None
+            if not dbo:
+                self.openCount += 1
+
+        if dbo and time.time() - dbo.lastUsed > self.healthCheckSeconds and not dbo.isHealthy():
+            dbo.close()
+            dbo = None
+            with self.condition:
+                self.replaced += 1
+        if not dbo:
+            try:
+                dbo = PooledDatabase(self.dbUri)
+                if not dbo.success:
+                    raise Exception('could not connect to database')
+            except:
+                with self.condition:
+                    self.openCount -= 1
+                    self.condition.notify()
+                raise
+        return dbo
+
+    def checkin(self, dbo, failed = False):
+        if failed and not dbo.isHealthy():
+            dbo.close()
+            with self.condition:
+                self.openCount -= 1
+                self.replaced += 1
+                self.condition.notify()
+            return
+        dbo.lastUsed = time.time()
+        with self.condition:
+            self.idle.append(dbo)
+            self.condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        #--checks a connection out for a with block
+        dbo = self.checkout()
+        try:
+            yield dbo
+        except:
+            self.checkin(dbo, failed = True)
+            raise
+        self.checkin(dbo)
+
+    def close(self):
+        with self.condition:
+            for dbo in self.idle:
+                dbo.close()
+            self.openCount -= len(self.idle)
+            self.idle = []
+
 # ==============================
 class G2CmdShell(cmd.Cmd):
 
@@ -277,10 +1394,21 @@ class G2CmdShell(cmd.Cmd):
 
         #--misc
         self.sqlCommitSize = 1000
+        self.sqlInListSize = 500 #--under the bind parameter limit of every supported database
         self.__hidden_methods = ('do_shell')
         self.doDebug = False
         self.searchMatchLevels = {1: 'Match', 2: 'Possible Match', 3: 'Possibly Related', 4: 'Name Only'}
         self.relatedMatchLevels = {1: 'Ambiguous Match', 2: 'Possible Match', 3: 'Possibly Related', 4: 'Name Only', 11: 'Disclosed Relation'}
+
+        #--the sections of the entity document each view reads, so hub entities do not send relationships or json nobody looks at
+        recordFlags = ['G2_ENTITY_INCLUDE_ENTITY_NAME', 'G2_ENTITY_INCLUDE_RECORD_DATA', 'G2_ENTITY_INCLUDE_RECORD_FORMATTED_DATA']
+        relatedFlags = ['G2_ENTITY_INCLUDE_ALL_RELATIONS', 'G2_ENTITY_INCLUDE_RELATED_ENTITY_NAME', 'G2_ENTITY_INCLUDE_RELATED_MATCHING_INFO']
+        self.entityFlagProfiles = {}
+        self.entityFlagProfiles['RECORDS'] = recordFlags
+        self.entityFlagProfiles['SUMMARY'] = recordFlags + relatedFlags + ['G2_ENTITY_INCLUDE_RELATED_RECORD_SUMMARY']
+        self.entityFlagProfiles['DETAIL'] = recordFlags + relatedFlags + ['G2_ENTITY_INCLUDE_RELATED_RECORD_SUMMARY', 'G2_ENTITY_INCLUDE_RECORD_MATCHING_INFO']
+        self.entityFlagProfiles['COMPARE'] = recordFlags + relatedFlags
+        self.entityFlagProfiles['EXPORT'] = ['G2_ENTITY_INCLUDE_RECORD_DATA', 'G2_ENTITY_INCLUDE_RECORD_JSON_DATA']
         self.validMatchLevelParameters = {}
         self.validMatchLevelParameters['0'] = 'SINGLE_SAMPLE'
         self.validMatchLevelParameters['1'] = 'DUPLICATE_SAMPLE'
@@ -321,19 +1449,24 @@ class G2CmdShell(cmd.Cmd):
         if args.audit_file_name:
             self.settingsFileData['pocAuditFile'] = args.audit_file_name
 
-        #--load prior snapshot file
-        if 'pocSnapshotFile' in self.settingsFileData and os.path.exists(self.settingsFileData['pocSnapshotFile']):
-            self.do_load(self.settingsFileData['pocSnapshotFile'])
-        else:
-            self.pocSnapshotFile = None
-            self.pocSnapshotData = {}
-
-        #--load prior audit file
-        if 'pocAuditFile' in self.settingsFileData and os.path.exists(self.settingsFileData['pocAuditFile']):
-            self.do_load(self.settingsFileData['pocAuditFile'])
-        else:
-            self.pocAuditFile = None
-            self.pocAuditData = {}
+        #--load prior snapshot and audit files in the background so engine commands can start right away
+        self.pocSnapshotFile = None
+        self.pocSnapshotData = {}
+        self.entitySizeIndex = None
+        self.pocAuditFile = None
+        self.pocAuditData = {}
+        self.auditCategoryIndex = {}
+        self.pendingLoads = OrderedDict()
+        self.entityCache = EntityCache()
+        self.searchCache = EntityCache(16777216, ttlSeconds = 300)
+        self.configCheckSeconds = 10
+        self.configCheckTime = 0
+        for settingName in ('pocSnapshotFile', 'pocAuditFile'):
+            if settingName in self.settingsFileData and os.path.exists(self.settingsFileData[settingName]):
+                fileName = self.settingsFileData[settingName]
+                progress = {}
+                self.pendingLoads[settingName] = (fileName, runInBackground(loadStatsFile, fileName, progress, self.statsCacheBytes()), progress)
+                printWithNewLines('loading %s in the background ...' % fileName)
 
         #--set the last table name
         self.lastTableName = os.path.join(os.path.expanduser("~"), 'pocTable.txt')
@@ -342,6 +1475,17 @@ class G2CmdShell(cmd.Cmd):
     def do_quit(self, arg):
         return True
 
+    # -----------------------------
+    def precmd(self, line):
+        self.waitForLoads(block=False)
+        engineStats.startCommand(line)
+        return line
+
+    # -----------------------------
+    def postcmd(self, stop, line):
+        engineStats.endCommand()
+        return stop
+
     # -----------------------------
     def emptyline(self):
         return
@@ -472,6 +1616,372 @@ class G2CmdShell(cmd.Cmd):
     def do_version (self,arg):
         printWithNewLines('POC Utilities version %s' % pocUtilsVersion, 'B')
 
+    # -----------------------------
+    def do_cacheStats (self,arg):
+        '\nDisplays the hits and misses of the entity cache shared by get, compare, why and export, of the search cache and of the feature cache shared by why and audit.\n'
+
+        tblTitle = 'Engine and database caches'
+        tblColumns = []
+        tblColumns.append({'name': 'Statistic', 'width': 25, 'align': 'left'})
+        tblColumns.append({'name': 'Entity cache', 'width': 25, 'align': 'right'})
+        tblColumns.append({'name': 'Search cache', 'width': 25, 'align': 'right'})
+        tblColumns.append({'name': 'Feature cache', 'width': 25, 'align': 'right'})
+        tblRows = [['Entries'], ['Size'], ['Hits'], ['Misses'], ['Hit rate'], ['Evictions'], ['Expirations'], ['Config changes']]
+        for responseCache in (self.entityCache, self.searchCache):
+            requestCount = responseCache.hits + responseCache.misses
+            tblRows[0].append(fmtStatistic(len(responseCache)))
+            tblRows[1].append('%s of %s MB' % (round(responseCache.totalBytes / 1048576, 1), round(responseCache.maxBytes / 1048576, 1)))
+            tblRows[2].append(fmtStatistic(responseCache.hits))
+            tblRows[3].append(fmtStatistic(responseCache.misses))
+            tblRows[4].append('%s%%' % (round(100 * responseCache.hits / requestCount, 1) if requestCount else 0))
+            tblRows[5].append(fmtStatistic(responseCache.evictions))
+            tblRows[6].append(fmtStatistic(responseCache.expirations) if responseCache.ttlSeconds else 'n/a')
+            tblRows[7].append(fmtStatistic(responseCache.invalidations))
+        requestCount = libFeatCache.hits + libFeatCache.misses
+        tblRows[0].append(fmtStatistic(len(libFeatCache)))
+        tblRows[1].append('%s of %s features' % (fmtStatistic(len(libFeatCache)), fmtStatistic(libFeatCache.maxEntries)))
+        tblRows[2].append(fmtStatistic(libFeatCache.hits))
+        tblRows[3].append(fmtStatistic(libFeatCache.misses))
+        tblRows[4].append('%s%%' % (round(100 * libFeatCache.hits / requestCount, 1) if requestCount else 0))
+        tblRows[5].append(fmtStatistic(libFeatCache.evictions))
+        tblRows[6].append('n/a')
+        tblRows[7].append('n/a')
+        self.renderTable(tblTitle, tblColumns, tblRows)
+
+    # -----------------------------
+    def do_cacheClear (self,arg):
+        '\nClears the entity, search and feature caches so the next get, compare, why, export or search goes back to the engine and database.\n'
+        self.entityCache.clear()
+        self.searchCache.clear()
+        libFeatCache.clear()
+        printWithNewLines('Entity, search and feature caches cleared', 'B')
+
+    # -----------------------------
+    def do_engineStats (self,arg):
+        '\nDisplays the calls, errors, latency and response sizes of each engine api and where the time of the last command went.' \
+        '\n\nSyntax:' \
+        '\n\tengineStats                  (all apis and the last command)' \
+        '\n\tengineStats <api name>       (latency histogram of one api)' \
+        '\n\tengineStats reset' \
+        '\n\tengineStats trace <file>     (appends a json line per engine call to the file)' \
+        '\n\tengineStats trace off\n'
+
+        argList = arg.split()
+        if argList and argList[0].upper() == 'RESET':
+            engineStats.reset()
+            printWithNewLines('Engine statistics reset', 'B')
+            return
+
+        if argList and argList[0].upper() == 'TRACE':
+            if len(argList) != 2:
+                argError(arg, 'a file name or off is required')
+                return
+            try: engineStats.setTrace(None if argList[1].upper() == 'OFF' else argList[1])
+            except IOError as err:
+                printWithNewLines('%s' % err, 'B')
+                return
+            if engineStats.traceFileName:
+                printWithNewLines('Tracing engine calls to %s' % engineStats.traceFileName, 'B')
+            else:
+                printWithNewLines('Engine call tracing is off', 'B')
+            return
+
+        fmtLimit = lambda x: '> %s' % fmtStatistic(EngineStats.bucketLimits[-2]) if x is None else fmtStatistic(x)
+
+        if argList:
+            apiName = [x for x in engineStats.apiStats if x.upper() == argList[0].upper()]
+            if not apiName:
+                argError(arg, 'no calls to this api yet')
+                return
+            apiStat = engineStats.apiStats[apiName[0]]
+            tblTitle = '%s latency' % apiName[0]
+            tblColumns = []
+            tblColumns.append({'name': 'Up to ms', 'width': 15, 'align': 'right'})
+            tblColumns.append({'name': 'Calls', 'width': 15, 'align': 'right'})
+            tblColumns.append({'name': 'Percent', 'width': 10, 'align': 'right'})
+            tblColumns.append({'name': 'Cumulative', 'width': 10, 'align': 'right'})
+            tblRows = []
+            callCount = 0
+            for bucketIndex in range(len(EngineStats.bucketLimits)):
+                bucketCount = apiStat['HISTOGRAM'][bucketIndex]
+                callCount += bucketCount
+                if bucketCount:
+                    tblRows.append([fmtLimit(EngineStats.bucketLimits[bucketIndex]),
+                                    fmtStatistic(bucketCount),
+                                    '%s%%' % round(100 * bucketCount / apiStat['CALLS'], 1),
+                                    '%s%%' % round(100 * callCount / apiStat['CALLS'], 1)])
+            self.renderTable(tblTitle, tblColumns, tblRows)
+            return
+
+        tblTitle = 'Engine calls'
+        tblColumns = []
+        tblColumns.append({'name': 'API', 'width': 30, 'align': 'left'})
+        tblColumns.append({'name': 'Calls', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'Errors', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'Avg ms', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'p50 ms', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'p95 ms', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'p99 ms', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'Max ms', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'Avg KB', 'width': 10, 'align': 'right'})
+        tblColumns.append({'name': 'Total MB', 'width': 10, 'align': 'right'})
+        tblRows = []
+        for apiName in sorted(engineStats.apiStats, key=lambda x: engineStats.apiStats[x]['SECONDS'], reverse=True):
+            apiStat = engineStats.apiStats[apiName]
+            tblRows.append([apiName,
+                            fmtStatistic(apiStat['CALLS']),
+                            fmtStatistic(apiStat['ERRORS']),
+                            round(1000 * apiStat['SECONDS'] / apiStat['CALLS'], 2),
+                            fmtLimit(engineStats.percentile(apiName, 50)),
+                            fmtLimit(engineStats.percentile(apiName, 95)),
+                            fmtLimit(engineStats.percentile(apiName, 99)),
+                            round(1000 * apiStat['MAX_SECONDS'], 2),
+                            round(apiStat['BYTES'] / apiStat['CALLS'] / 1024, 1),
+                            round(apiStat['BYTES'] / 1048576, 2)])
+        if engineStats.jsonCount:
+            tblRows.append(['json parsing',
+                            fmtStatistic(engineStats.jsonCount),
+                            '',
+                            round(1000 * engineStats.jsonSeconds / engineStats.jsonCount, 2),
+                            '', '', '', '',
+                            round(engineStats.jsonBytes / engineStats.jsonCount / 1024, 1),
+                            round(engineStats.jsonBytes / 1048576, 2)])
+        if not tblRows:
+            printWithNewLines('No engine calls yet', 'B')
+        else:
+            self.renderTable(tblTitle, tblColumns, tblRows)
+        if engineStats.traceFileName:
+            printWithNewLines('Tracing engine calls to %s' % engineStats.traceFileName, 'S')
+        if g2DbPool:
+            printWithNewLines('Database pool: %s of %s connections open, %s idle, %s checkouts, %s waited, %s replaced' % (g2DbPool.openCount, g2DbPool.maxConnections, len(g2DbPool.idle), g2DbPool.checkouts, g2DbPool.waits, g2DbPool.replaced), 'S')
+
+        if engineStats.lastCommand:
+            lastCommand = engineStats.lastCommand
+            otherSeconds = max(lastCommand['SECONDS'] - lastCommand['ENGINE_SECONDS'] - lastCommand['JSON_SECONDS'], 0)
+            tblTitle = 'Last command: %s' % lastCommand['COMMAND']
+            tblColumns = []
+            tblColumns.append({'name': 'Time spent', 'width': 30, 'align': 'left'})
+            tblColumns.append({'name': 'Seconds', 'width': 15, 'align': 'right'})
+            tblColumns.append({'name': 'Percent', 'width': 10, 'align': 'right'})
+            tblRows = []
+            tblRows.append(['Elapsed', round(lastCommand['SECONDS'], 3), '100%'])
+            tblRows.append(['Engine (%s calls)' % fmtStatistic(lastCommand['ENGINE_CALLS']), round(lastCommand['ENGINE_SECONDS'], 3), '%s%%' % (round(100 * lastCommand['ENGINE_SECONDS'] / lastCommand['SECONDS'], 1) if lastCommand['SECONDS'] else 0)])
+            tblRows.append(['Json parsing', round(lastCommand['JSON_SECONDS'], 3), '%s%%' % (round(100 * lastCommand['JSON_SECONDS'] / lastCommand['SECONDS'], 1) if lastCommand['SECONDS'] else 0)])
+            tblRows.append(['Rendering and other', round(otherSeconds, 3), '%s%%' % (round(100 * otherSeconds / lastCommand['SECONDS'], 1) if lastCommand['SECONDS'] else 0)])
+            self.renderTable(tblTitle, tblColumns, tblRows)
+            printWithNewLines('Engine and json seconds are summed across threads so may exceed the elapsed time of parallel commands', 'S')
+
+    # -----------------------------
+    def fetchEntity(self, apiName, entityId, flags = None):
+        #--calls an entity api through the entity cache, the response is left for jsonDecode
+
+        cacheKey = (apiName, int(entityId), flags)
+        self.checkCacheConfig()
+        response = self.entityCache.get(cacheKey)
+        if response is not None:
+            return response
+
+        if flags is None:
+            response = self.engineCall(apiName, int(entityId))
+        else:
+            response = self.engineCall(apiName, int(entityId), flags)
+        if response:
+            self.entityCache.put(cacheKey, response)
+        return response
+
+    # -----------------------------
+    def entityProfile(self, profileName):
+        #--the api and flags that get just the sections of a flag profile
+        #--the full default document on engines without the V2 api or one of the flags
+        if oldG2Module or not hasattr(g2Engine, 'getEntityByEntityIDV2'):
+            return 'getEntityByEntityID', None
+        flags = 0
+        for flagName in self.entityFlagProfiles[profileName]:
+            flagValue = getattr(g2Engine, flagName, 0)
+            if not flagValue:
+                return 'getEntityByEntityID', None
+            flags |= flagValue
+        return 'getEntityByEntityIDV2', flags
+
+    # -----------------------------
+    def fetchEntities(self, apiName, entityIdList, flags = None, maxWorkers = 20):
+        #--fetchEntity for a list of ids on a thread pool, responses in list order
+        #--on a failure the calls not started are cancelled and the earliest entity's error is raised
+        if len(entityIdList) <= 1:
+            return [self.fetchEntity(apiName, entityId, flags) for entityId in entityIdList]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(entityIdList), maxWorkers)) as executor:
+            futureList = [executor.submit(self.fetchEntity, apiName, entityId, flags) for entityId in entityIdList]
+            for future in concurrent.futures.as_completed(futureList):
+                if future.exception():
+                    for pendingFuture in futureList:
+                        pendingFuture.cancel()
+                    break
+
+        responseList = []
+        for future in futureList:
+            if not future.cancelled() and future.exception():
+                raise future.exception()
+            responseList.append(None if future.cancelled() else future.result())
+        return responseList
+
+    # -----------------------------
+    def activeConfigId(self):
+        if oldG2Module or not hasattr(g2Engine, 'getActiveConfigID'):
+            return None
+        try: 
+            return self.engineCall('getActiveConfigID').decode()
+        except:
+            return None
+
+    # -----------------------------
+    def checkCacheConfig(self):
+        #--empties the response caches if the config changed, asking at most every configCheckSeconds
+        if time.time() - self.configCheckTime < self.configCheckSeconds:
+            return
+        self.configCheckTime = time.time()
+        configId = self.activeConfigId()
+        self.entityCache.checkConfig(configId)
+        self.searchCache.checkConfig(configId)
+
+    # -----------------------------
+    def engineCall(self, apiName, *callArgs, hasResponse = True):
+        #--calls an engine api and times it into the engine statistics, the response is left undecoded
+        #--the old G2Module returns the response rather than filling in one passed to it
+        response = bytearray()
+        errorText = None
+        startTime = time.time()
+        try:
+            if oldG2Module and apiName in ('getEntityByEntityID', 'getEntityByRecordID', 'searchByAttributes'):
+                response = getattr(g2Engine, apiName)(*callArgs)
+            elif hasResponse:
+                retcode = getattr(g2Engine, apiName)(*callArgs, response)
+            else:
+                retcode = getattr(g2Engine, apiName)(*callArgs)
+        except Exception as err:
+            errorText = str(err)
+            raise
+        finally:
+            engineStats.recordCall(apiName, time.time() - startTime, len(response) if response else 0, errorText, callArgs)
+        return response
+
+    # -----------------------------
+    def do_prefetch (self,arg):
+        '\nSets how many of the next samples are fetched in the background while reviewing a list and whether' \
+        '\nthe why results are fetched along with the entities. A window of 0 turns prefetching off.' \
+        '\n\nSyntax:' \
+        '\n\tprefetch                   (displays the current settings)' \
+        '\n\tprefetch window <n>' \
+        '\n\tprefetch why on|off\n'
+
+        argList = arg.split()
+        if len(argList) == 2 and argList[0].upper() == 'WINDOW' and argList[1].isnumeric():
+            self.settingsFileData['prefetchWindow'] = int(argList[1])
+        elif len(argList) == 2 and argList[0].upper() == 'WHY' and argList[1].upper() in ('ON', 'OFF'):
+            self.settingsFileData['prefetchWhy'] = argList[1].upper() == 'ON'
+        elif argList:
+            argError(arg, 'expected window <n> or why on|off')
+            return
+
+        printWithNewLines('prefetch window set to %s, why %s' % (self.settingsFileData.get('prefetchWindow', 3), 'on' if self.settingsFileData.get('prefetchWhy') else 'off'), 'B')
+
+    # -----------------------------
+    def do_statsCache (self,arg):
+        '\nSets whether loaded snapshot and audit files are copied to an indexed cache that later loads open instead of reading' \
+        '\nthe json and how many MB the cache may use, the least recently loaded files are removed from it first.' \
+        '\n\nSyntax:' \
+        '\n\tstatsCache                 (displays the current settings)' \
+        '\n\tstatsCache on|off' \
+        '\n\tstatsCache size <MB>' \
+        '\n\tstatsCache clear          (removes every cached file)\n'
+
+        argList = arg.split()
+        if len(argList) == 1 and argList[0].upper() in ('ON', 'OFF'):
+            self.settingsFileData['statsCache'] = argList[0].upper() == 'ON'
+        elif len(argList) == 2 and argList[0].upper() == 'SIZE' and argList[1].isnumeric():
+            self.settingsFileData['statsCacheMB'] = int(argList[1])
+        elif len(argList) == 1 and argList[0].upper() == 'CLEAR':
+            for fileName in glob.glob(os.path.join(statsCacheDir(), '*')):
+                try: os.remove(fileName)
+                except OSError: pass
+        elif argList:
+            argError(arg, 'expected on|off, size <MB> or clear')
+            return
+
+        cacheBytes = 0
+        for fileName in glob.glob(os.path.join(statsCacheDir(), '*')):
+            try: cacheBytes += os.path.getsize(fileName)
+            except OSError: pass
+        printWithNewLines('statistics file cache %s, %s of %s MB used in %s' % ('on' if self.settingsFileData.get('statsCache', True) else 'off', round(cacheBytes / 1048576, 1), self.settingsFileData.get('statsCacheMB', 1024), statsCacheDir()), 'B')
+
+    # -----------------------------
+    def statsCacheBytes(self):
+        #--0 when the statistics file cache is turned off
+        if not self.settingsFileData.get('statsCache', True):
+            return 0
+        return self.settingsFileData.get('statsCacheMB', 1024) * 1048576
+
+    # -----------------------------
+    def do_jsonBenchmark (self,arg):
+        '\nTimes parsing and writing an engine response with the standard python json module against the json codec in use.' \
+        '\nThe codec uses orjson if it is installed (pip3 install orjson) and parses the engine response without decoding it first.' \
+        '\n\nSyntax:' \
+        '\n\tjsonBenchmark                              (uses a generated 5000 record entity)' \
+        '\n\tjsonBenchmark <entity_id> [iterations <n>]   (uses the why response of an entity)\n'
+
+        argList = arg.split()
+        iterations = 10
+        if len(argList) >= 2 and argList[-2].upper() == 'ITERATIONS' and argList[-1].isnumeric() and int(argList[-1]) > 0:
+            iterations = int(argList[-1])
+            argList = argList[:-2]
+
+        if argList:
+            try: payload = self.fetchEntity('whyEntityByEntityID', argList[0])
+            except (G2Exception, ValueError) as err:
+                printWithNewLines(str(err), 'B')
+                return
+            if isinstance(payload, str):
+                payload = payload.encode('utf-8')
+            payloadDesc = 'why entity %s' % argList[0]
+        else:
+            recordList = []
+            for recordNumber in range(5000):
+                jsonData = {'DATA_SOURCE': 'TEST', 'RECORD_ID': str(recordNumber), 'NAME_FULL': 'Name %s' % recordNumber, 'DATE_OF_BIRTH': '1980-01-01', 'ADDR_FULL': '%s Main Street, Anytown' % recordNumber}
+                recordList.append({'DATA_SOURCE': 'TEST', 'RECORD_ID': str(recordNumber), 'JSON_DATA': jsonData, 'NAME_DATA': ['PRIMARY: Name %s' % recordNumber], 'ADDRESS_DATA': ['%s Main Street, Anytown' % recordNumber], 'MATCH_KEY': '+NAME+DOB+ADDRESS', 'ERRULE_CODE': 'SF1', 'INTERNAL_ID': recordNumber, 'FEATURES': [{'LIB_FEAT_ID': recordNumber * 3 + i} for i in range(3)]})
+            payload = json.dumps({'RESOLVED_ENTITY': {'ENTITY_ID': 1, 'ENTITY_NAME': 'Name 0', 'RECORDS': recordList}}).encode('utf-8')
+            payloadDesc = 'generated 5000 record entity'
+
+        def timeIt(func, value):
+            startTime = time.time()
+            for i in range(iterations):
+                func(value)
+            return (time.time() - startTime) / iterations
+
+        jsonData = jsonDecode(payload)
+        tblRows = []
+        for stepName, stdlibFunc, codecFunc, value in [['Parse response', lambda x: json.loads(x.decode()), jsonDecode, payload],
+                                                       ['Write json', json.dumps, lambda x: jsonEncode(x, asBytes=True), jsonData]]:
+            stdlibSeconds = timeIt(stdlibFunc, value)
+            codecSeconds = timeIt(codecFunc, value)
+            tblRows.append([stepName, '%s ms' % round(1000 * stdlibSeconds, 1), '%s ms' % round(1000 * codecSeconds, 1), '%sx' % round(stdlibSeconds / codecSeconds, 1) if codecSeconds else ''])
+
+        tblTitle = 'Json codec benchmark, %s, %s MB, %s iterations' % (payloadDesc, round(len(payload) / 1048576, 1), iterations)
+        tblColumns = []
+        tblColumns.append({'name': 'Step', 'width': 25, 'align': 'left'})
+        tblColumns.append({'name': 'Python json', 'width': 20, 'align': 'right'})
+        tblColumns.append({'name': 'Codec (%s)' % ('orjson' if hasOrjson else 'json'), 'width': 20, 'align': 'right'})
+        tblColumns.append({'name': 'Speedup', 'width': 15, 'align': 'right'})
+        self.renderTable(tblTitle, tblColumns, tblRows)
+
+    # -----------------------------
+    def samplePrefetcher(self, sampleCount, sampleEntities, needsDatabase = False, fetchEntities = True):
+        #--prefetches a review list with the current settings, the caller cancels it on quit
+        return SamplePrefetcher(self, sampleCount, sampleEntities,
+                                window = self.settingsFileData.get('prefetchWindow', 3) if g2Engine else 0,
+                                fetchWhy = self.settingsFileData.get('prefetchWhy', False),
+                                needsDatabase = needsDatabase,
+                                fetchEntities = fetchEntities)
+
     # -----------------------------
     def do_colorScheme (self,arg):
         '\nSets the color scheme lighter or darker. Darker works better on lighter backgrounds and vice-versa.' \
@@ -518,7 +2028,9 @@ class G2CmdShell(cmd.Cmd):
         '\nLoads statistical json files computed by pocSnapshot.py or pocAudit.py.' \
         '\n\nSyntax:' \
         '\n\tload <pocSnapshot json file>' \
-        '\n\tload <pocAudit json file>\n'
+        '\n\tload <pocAudit json file>' \
+        '\n\nNotes: ' \
+        '\n\tThe json files may also be gzip (.gz) or zstandard (.zst) compressed.\n'
         if not argCheck('do_load', arg, self.do_load.__doc__):
             return
 
@@ -527,24 +2039,85 @@ class G2CmdShell(cmd.Cmd):
             printWithNewLines('file %s not found!' % (statpackFileName), 'B')
             return
 
-        try: jsonData = json.load(open(statpackFileName), encoding="utf-8")
+        #--a file still loading in the background is waited for rather than loaded a second time
+        for settingName in list(self.pendingLoads):
+            if os.path.abspath(self.pendingLoads[settingName][0]) == os.path.abspath(statpackFileName):
+                self.waitForLoads(settingNames = [settingName])
+                return
+
+        try: jsonData = loadStatsFile(statpackFileName, None, self.statsCacheBytes())
+        except ImportError as err:
+            printWithNewLines(str(err), 'B')
+            return
         except:
             printWithNewLines('Invalid json in %s' % statpackFileName, 'B')
             return
 
+        self.applyStatsFile(statpackFileName, jsonData)
+
+    # -----------------------------
+    def applyStatsFile(self, statpackFileName, jsonData):
+
         if 'SOURCE' in jsonData and jsonData['SOURCE'] in ('pocCalculate', 'pocSnapshot'):
+            self.pendingLoads.pop('pocSnapshotFile', None) #--supersedes one still loading
             self.settingsFileData['pocSnapshotFile'] = statpackFileName
             self.pocSnapshotFile = statpackFileName
             self.pocSnapshotData = jsonData
+            self.entitySizeIndex = None
+            if 'ENTITY_SIZE_BREAKDOWN' in jsonData:
+                try: self.entitySizeIndex = EntitySizeIndex(jsonData['ENTITY_SIZE_BREAKDOWN'])
+                except: pass
             printWithNewLines('%s sucessfully loaded!' % statpackFileName, 'B')
         elif 'SOURCE' in jsonData and jsonData['SOURCE'] == 'pocAudit':
+            self.pendingLoads.pop('pocAuditFile', None) #--supersedes one still loading
             self.settingsFileData['pocAuditFile'] = statpackFileName
             self.pocAuditFile = statpackFileName
             self.pocAuditData = jsonData
+            self.auditCategoryIndex = {}
+            for category in (jsonData['AUDIT'] if 'AUDIT' in jsonData else {}):
+                try: self.auditCategoryIndex[category] = AuditCategoryIndex(jsonData['AUDIT'][category]['SUB_CATEGORY'])
+                except: pass
             printWithNewLines('%s sucessfully loaded!' % statpackFileName, 'B')
         else:
             printWithNewLines('Invalid statistics file %s' % statpackFileName, 'B')
 
+    # -----------------------------
+    def waitForLoads(self, block=True, settingNames=None):
+        #--applies the files loaded in the background, False if the wait was interrupted
+
+        for settingName in (settingNames or list(self.pendingLoads)):
+            if settingName not in self.pendingLoads:
+                continue
+            fileName, future, progress = self.pendingLoads[settingName]
+            if not block and not future.done():
+                continue
+
+            try:
+                while True:
+                    try: 
+                        jsonData = future.result(timeout=0.5)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        percent = (100 * progress.get('done', 0) // progress['total']) if progress.get('total') else 0
+                        sys.stdout.write('\r%s %s ... %s%%  ' % (progress.get('phase', 'loading'), fileName, percent))
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                printWithNewLines('\nstill loading %s in the background' % fileName, 'E')
+                return False
+            except ImportError as err:
+                del self.pendingLoads[settingName]
+                printWithNewLines(str(err), 'B')
+                continue
+            except:
+                del self.pendingLoads[settingName]
+                printWithNewLines('Invalid json in %s' % fileName, 'B')
+                continue
+
+            del self.pendingLoads[settingName]
+            self.applyStatsFile(fileName, jsonData)
+
+        return True
+
     # -----------------------------
     def complete_load(self, text, line, begidx, endidx):
         before_arg = line.rfind(" ", 0, begidx)
@@ -568,6 +2141,9 @@ class G2CmdShell(cmd.Cmd):
         '\n\tauditSummary       (with no parameters displays the overall stats)' \
         '\n\tauditSummary merge (shows examples of splits or merges or both)\n'
 
+        if not self.waitForLoads(settingNames = ['pocAuditFile']):
+            return
+
         if not self.pocAuditData or 'AUDIT' not in self.pocAuditData:
             printWithNewLines('Please load a json file created with pocAudit.py to use this feature', 'B')
             return
@@ -681,17 +2257,10 @@ class G2CmdShell(cmd.Cmd):
                 displayColor = self.colors['bad']
 
             #--get top 10 sub categories
-            i = 0
-            subCategoryList = []
-            for subCategory in sorted(self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'], key=lambda x: self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'][x]['COUNT'], reverse=True):
-                i += 1
-                if i <= 10:
-                    subCategoryList.append({'INDEX': i, 'NAME': subCategory, 'LIST': [subCategory], 'COUNT': self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'][subCategory]['COUNT']})
-                elif i == 11:
-                    subCategoryList.append({'INDEX': i, 'NAME': 'OTHERS', 'LIST': [subCategory], 'COUNT': self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'][subCategory]['COUNT']})
-                else:
-                    subCategoryList[10]['LIST'].append(subCategory)
-                    subCategoryList[10]['COUNT'] += self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'][subCategory]['COUNT']
+            if category not in self.auditCategoryIndex:
+                self.auditCategoryIndex[category] = AuditCategoryIndex(self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'])
+            subCategoryIndexer = self.auditCategoryIndex[category]
+            subCategoryList = subCategoryIndexer.subCategoryList
 
             #--display sub-categories
             if len(argList) == 1:
@@ -709,31 +2278,24 @@ class G2CmdShell(cmd.Cmd):
                 return
 
             #--find the detail records to display
-            subCategoryIndex = -1
-            if argList[1].isdigit() and int(argList[1]) >= 1 and int(argList[1]) <= 11:
-                subCategoryIndex = int(argList[1]) - 1
-            else:                
-                for i in range(len(subCategoryList)):
-                    if argList[1].upper() == subCategoryList[i]:
-                        subCategoryIndex = i
-                        break
-
+            subCategoryIndex = subCategoryIndexer.findSubCategory(' '.join(argList[1:]))
             if subCategoryIndex == -1:
                 printWithNewLines('%s not found, please choose a valid split or merge sub-category' % arg, 'B')
                 return
 
             #--gather sample records
-            sampleRecords = []
-            for subCategory in self.pocAuditData['AUDIT'][category]['SUB_CATEGORY']:
-                if subCategory in subCategoryList[subCategoryIndex]['LIST']:
-                    sampleRecords += self.pocAuditData['AUDIT'][category]['SUB_CATEGORY'][subCategory]['SAMPLE']
+            sampleRecords = subCategoryIndexer.samples(subCategoryIndex)
+            if len(sampleRecords) == 0:
+                printWithNewLines('No samples found for %s' % arg, 'B')
+                return
 
-            #--display sample records
+            #--display sample records, the audit result comes from the database so only its why is worth prefetching
+            prefetcher = self.samplePrefetcher(len(sampleRecords), lambda sampleIndex, dbo: list(set([x['newer_id'] for x in sampleRecords[sampleIndex]])), fetchEntities = False)
             currentSample = 0
             while True:
 
                 self.auditResult(sampleRecords[currentSample])
-                exportRecords = list(set([x['newer_id'] for x in sampleRecords[currentSample]]))
+                exportRecords = prefetcher.entityIds(currentSample)
 
                 while True:
                     reply = userInput('Select (P)revious, (N)ext, (S)croll, (W)hy, (E)xport, (Q)uit ... ')
@@ -775,11 +2337,12 @@ class G2CmdShell(cmd.Cmd):
 
                 if reply.upper().startswith('Q'):
                     break
+            prefetcher.cancel()
 
     # -----------------------------
     def auditResult (self, arg):
 
-        if not g2Dbo:
+        if not g2DbPool:
             print('')
             print('Sorry a database conenction is required for this function!')
             print('')
@@ -804,21 +2367,14 @@ class G2CmdShell(cmd.Cmd):
         sql1 += ' b.OBS_ENT_ID '
         sql1 += 'from DSRC_RECORD a '
         sql1 += 'join OBS_ENT b on b.ENT_SRC_KEY = a.ENT_SRC_KEY and b.DSRC_ID = a.DSRC_ID and b.ETYPE_ID = a.ETYPE_ID '
-        sql1 += 'where a.RECORD_ID = ? and a.DSRC_ID = ?'
-        sql1a = sql1.replace(' and a.DSRC_ID = ?', '') #--if data source not present
+        sql1 += 'where a.RECORD_ID in (%s)'
 
         sql2 = 'select '
-        sql2 += '  b.FTYPE_ID, '
-        sql2 += '  b.LIB_FEAT_ID, '
-        sql2 += '  b.FEAT_DESC '
-        sql2 += 'from OBS_FEAT_EKEY a '
-        sql2 += 'join LIB_FEAT b on b.LIB_FEAT_ID = a.LIB_FEAT_ID '
-        sql2 += 'where a.OBS_ENT_ID = ? '
-        sql2 += 'order by b.FTYPE_ID '
+        sql2 += '  OBS_ENT_ID, '
+        sql2 += '  LIB_FEAT_ID '
+        sql2 += 'from OBS_FEAT_EKEY '
+        sql2 += 'where OBS_ENT_ID in (%s) '
 
-        #--get the features
-        updatedRecords = []
-        ftypesUsed = []
         for auditRecord in auditRecords:
             if 'data_source' in auditRecord:
                 try: auditRecord['dsrc_id'] = self.dsrcCodeLookup[auditRecord['data_source']]['DSRC_ID']
@@ -829,19 +2385,40 @@ class G2CmdShell(cmd.Cmd):
                 auditRecord['dsrc_id'] = None
                 dataSourcePresent = False
 
-            if auditRecord['dsrc_id']:
-                dsrcRecord = g2Dbo.fetchNext(g2Dbo.sqlExec(sql1, [auditRecord['record_id'], int(auditRecord['dsrc_id'])]))
-            else:
-                dsrcRecord = g2Dbo.fetchNext(g2Dbo.sqlExec(sql1a, [auditRecord['record_id'],]))
+        #--look up the whole sample a chunk of ids at a time rather than a query or two per record
+        dsrcRecords = {}
+        featureLists = {}
+        with g2DbPool.connection() as dbo:
+            recordIdList = list(OrderedDict.fromkeys([auditRecord['record_id'] for auditRecord in auditRecords]))
+            for i in range(0, len(recordIdList), self.sqlInListSize):
+                chunkList = recordIdList[i:i + self.sqlInListSize]
+                for dsrcRecord in dbo.fetchAllDicts(dbo.sqlExec(sql1 % ','.join(['?'] * len(chunkList)), chunkList)):
+                    dsrcRecords.setdefault((dsrcRecord['RECORD_ID'], int(dsrcRecord['DSRC_ID'])), dsrcRecord)
+                    dsrcRecords.setdefault((dsrcRecord['RECORD_ID'], None), dsrcRecord) #--if data source not present
+
+            featureKeys = []
+            obsEntIdList = list(OrderedDict.fromkeys([dsrcRecord['OBS_ENT_ID'] for dsrcRecord in dsrcRecords.values()]))
+            for i in range(0, len(obsEntIdList), self.sqlInListSize):
+                chunkList = obsEntIdList[i:i + self.sqlInListSize]
+                featureKeys.extend(dbo.fetchAllDicts(dbo.sqlExec(sql2 % ','.join(['?'] * len(chunkList)), chunkList)))
+
+            #--the feature descriptions come from the shared cache, only the ones not seen before go to the database
+            libFeatures = libFeatCache.getFeatures(dbo, [featureKey['LIB_FEAT_ID'] for featureKey in featureKeys], chunkSize = self.sqlInListSize)
+            for featureKey in featureKeys:
+                if int(featureKey['LIB_FEAT_ID']) in libFeatures:
+                    featureLists.setdefault(featureKey['OBS_ENT_ID'], []).append(libFeatures[int(featureKey['LIB_FEAT_ID'])])
+
+        #--get the features
+        updatedRecords = []
+        ftypesUsed = []
+        for auditRecord in auditRecords:
+            dsrcRecord = dsrcRecords.get((auditRecord['record_id'], int(auditRecord['dsrc_id']) if auditRecord['dsrc_id'] else None))
 
             auditRecord['features'] = {}
             if not dsrcRecord:
                 auditRecord['record_id'] = '** ' + auditRecord['record_id']
             else:
-                lastFtypeCode = None
-                featureString = ''
-                featureList = g2Dbo.fetchAllDicts(g2Dbo.sqlExec(sql2, [dsrcRecord['OBS_ENT_ID'],]))
-                for feature in featureList:
+                for feature in sorted(featureLists.get(dsrcRecord['OBS_ENT_ID'], []), key=lambda k: k['FTYPE_ID']):
                     ftypeCode = self.ftypeLookup[feature['FTYPE_ID']]['FTYPE_CODE']
                     if ftypeCode in self.scoredFtypeCodes:
                         if feature['FTYPE_ID'] not in ftypesUsed:
@@ -941,6 +2518,9 @@ class G2CmdShell(cmd.Cmd):
         '\n\tReview items are suggestions of records to look at because they contain multiple names, addresses, dobs, etc.' \
         '\n\tThey may be overmatches or they may just be large entities with lots of values.\n'
 
+        if not self.waitForLoads(settingNames = ['pocSnapshotFile']):
+            return
+
         if not self.pocSnapshotData or 'ENTITY_SIZE_BREAKDOWN' not in self.pocSnapshotData:
             printWithNewLines('Please load a json file created with pocSnapshot.py to use this feature', 'B')
             return
@@ -968,7 +2548,7 @@ class G2CmdShell(cmd.Cmd):
                 row.append('%s' % (entitySizeData['REVIEW_COUNT'], ))
                 reviewReasons = []
                 for reviewReason in entitySizeData['REVIEW_REASONS']:
-                    reviewReasons.append('%s %s' % (len(entitySizeData['REVIEW_REASONS'][reviewReason]), reviewReason))
+                    reviewReasons.append('%s %s' % (jsonItemCount(entitySizeData['REVIEW_REASONS'], reviewReason), reviewReason))
                 row.append(' | '.join(reviewReasons))    
                 tblRows.append(row)
             self.renderTable(tblTitle, tblColumns, tblRows)
@@ -1006,40 +2586,18 @@ class G2CmdShell(cmd.Cmd):
             #    printWithNewLines('%s is an invalid argument' % arg, 'B')
             #    return
 
-            sampleRecords = []
-            for entitySizeData in self.pocSnapshotData['ENTITY_SIZE_BREAKDOWN']:
-
-                #--determine if all or review only entities
-                if not reviewOnly:
-                    theseRecords = [{"entity_id": str(i), "entity_size": entitySizeData['ENTITY_SIZE'], "review_only": reviewOnly, "review_reason": None} for i in entitySizeData['SAMPLE_ENTITIES']]
-                else:
-                    theseRecords = []
-                    for thisReason in entitySizeData['REVIEW_REASONS']:
-                        add2List = True
-                        if reviewReason:
-                            add2List = reviewReason in thisReason
-                        if add2List:
-                            theseRecords.extend([{"entity_id": str(i), "entity_size": entitySizeData['ENTITY_SIZE'], "review_only": reviewOnly, "review_reason": thisReason} for i in entitySizeData['REVIEW_REASONS'][thisReason]])
-                            #print(theseRecords )
-                if not theseRecords:
-                    continue
-
-                #--add these entities if qualifies entity size argument
-                if sign in ('=', '>=', '<=') and entitySizeData['ENTITY_SIZE'] == size:
-                    sampleRecords = theseRecords
-                    break
-                elif sign in ('<', '<=') and entitySizeData['ENTITY_SIZE'] < size:
-                    sampleRecords = theseRecords + sampleRecords 
-                elif sign in ('>', '>=') and entitySizeData['ENTITY_SIZE'] > size:
-                    sampleRecords = sampleRecords + theseRecords 
+            if not self.entitySizeIndex:
+                self.entitySizeIndex = EntitySizeIndex(self.pocSnapshotData['ENTITY_SIZE_BREAKDOWN'])
+            sampleRecords = self.entitySizeIndex.select(sign, size, reviewOnly, reviewReason)
 
             if len(sampleRecords) == 0:
                 print('\nNo records found for entitySizeBreakdown %s, command syntax: %s \n' % (arg, '\n\n' + self.do_entitySizeBreakdown.__doc__[1:]))
             else:
 
+                prefetcher = self.samplePrefetcher(len(sampleRecords), lambda sampleIndex, dbo: [sampleRecords[sampleIndex]['entity_id']])
                 currentSample = 0
                 while True:
-                    exportRecords = [sampleRecords[currentSample]['entity_id']]
+                    exportRecords = prefetcher.entityIds(currentSample)
 
                     self.currentReviewList = 'ENTITY SIZE %s' % sampleRecords[currentSample]['entity_size']
                     if sampleRecords[currentSample]['review_reason']:
@@ -1091,6 +2649,7 @@ class G2CmdShell(cmd.Cmd):
 
                     if reply.upper().startswith('Q'):
                         break
+                prefetcher.cancel()
                 self.currentReviewList = None
 
     # -----------------------------
@@ -1100,6 +2659,9 @@ class G2CmdShell(cmd.Cmd):
         '\n\tdataSourceSummary (with no parameters displays the overall stats)' \
         '\n\tdataSourceSummary <dataSourceCode> <matchLevel>  where 0=Singletons, 1=Duplicates, 2=Ambiguous Matches, 3 = Possible Matches, 4=Possibly Relateds\n'
 
+        if not self.waitForLoads(settingNames = ['pocSnapshotFile']):
+            return
+
         if not self.pocSnapshotData or 'DATA_SOURCES' not in self.pocSnapshotData:
             printWithNewLines('Please load a json file created with pocSnapshot.py to use this feature', 'B')
             return
@@ -1167,7 +2729,7 @@ class G2CmdShell(cmd.Cmd):
                 printWithNewLines('%s is not a valid match level' % matchLevel, 'B')
                 return
 
-            try: sampleRecords = [k for k in self.pocSnapshotData['DATA_SOURCES'][dataSource][matchLevelCode]]
+            try: sampleRecords = self.pocSnapshotData['DATA_SOURCES'][dataSource][matchLevelCode]
             except:
                 printWithNewLines('no samples found for %s' % arg, 'B')
                 return
@@ -1176,24 +2738,30 @@ class G2CmdShell(cmd.Cmd):
                 printWithNewLines('no entities to display!', 'B')
             else:
 
+                def sampleEntities(sampleIndex, dbo):
+                    if matchLevelCode in ('SINGLE_SAMPLE', 'DUPLICATE_SAMPLE'):
+                        return [str(sampleRecords[sampleIndex])]
+                    entityIds = sampleEntityIds(sampleRecords[sampleIndex])
+                    if matchLevelCode == 'AMBIGUOUS_MATCH_SAMPLE':
+                        ambiguousList =self.getAmbiguousEntitySet(entityIds[0], dbo) #--is this the ambiguous entity
+                        if ambiguousList:
+                            entityIds = ambiguousList
+                        else:
+                            ambiguousList =self.getAmbiguousEntitySet(entityIds[1], dbo) #--or is this the ambiguous entity
+                            if ambiguousList:
+                                entityIds = ambiguousList
+                            else:
+                                pass #--if its neither, just show the original two entities
+                    return entityIds
+
                 self.currentReviewList = 'DATA SOURCE SUMMARY FOR: %s (%s)' % (dataSource, matchLevelCode) 
+                prefetcher = self.samplePrefetcher(len(sampleRecords), sampleEntities, needsDatabase = matchLevelCode == 'AMBIGUOUS_MATCH_SAMPLE')
                 currentSample = 0
                 while True:
+                    exportRecords = prefetcher.entityIds(currentSample)
                     if matchLevelCode in ('SINGLE_SAMPLE', 'DUPLICATE_SAMPLE'):
-                        exportRecords = [str(sampleRecords[currentSample])]
                         returnCode = self.do_get(exportRecords[0])
                     else:
-                        exportRecords = sampleRecords[currentSample].split()[:2]
-                        if matchLevelCode == 'AMBIGUOUS_MATCH_SAMPLE':
-                            ambiguousList =self.getAmbiguousEntitySet(exportRecords[0]) #--is this the ambiguous entity
-                            if ambiguousList:
-                                exportRecords = ambiguousList
-                            else:
-                                ambiguousList =self.getAmbiguousEntitySet(exportRecords[1]) #--or is this the ambiguous entity
-                                if ambiguousList:
-                                    exportRecords = ambiguousList
-                                else:
-                                    pass #--if its neither, just show the original two entities
                         returnCode = self.do_compare(','.join(exportRecords))
                     if returnCode != 0:
                         printWithNewLines('The statistics loaded are out of date for this record!','E')
@@ -1243,6 +2811,7 @@ class G2CmdShell(cmd.Cmd):
 
                     if reply.upper().startswith('Q'):
                         break
+                prefetcher.cancel()
             self.currentReviewList = None
 
     # -----------------------------
@@ -1275,6 +2844,9 @@ class G2CmdShell(cmd.Cmd):
         '\n\tcrossSourceSummary (with no parameters displays the overall stats)' \
         '\n\tcrossSourceSummary <dataSource1> <dataSource2> <matchLevel>  where 1=Matches, 2=Ambiguous Matches, 3 = Possible Matches, 4=Possibly Relateds\n'
  
+        if not self.waitForLoads(settingNames = ['pocSnapshotFile']):
+            return
+
         if not self.pocSnapshotData or 'DATA_SOURCES' not in self.pocSnapshotData:
             printWithNewLines('Please load a json file created with pocSnapshot.py to use this feature', 'B')
             return
@@ -1350,7 +2922,7 @@ class G2CmdShell(cmd.Cmd):
             if matchLevelCode == 'DUPLICATE_SAMPLE':
                 matchLevelCode = 'MATCH_SAMPLE'
 
-            try: sampleRecords = [k for k in self.pocSnapshotData['DATA_SOURCES'][dataSource1]['CROSS_MATCHES'][dataSource2][matchLevelCode]]
+            try: sampleRecords = self.pocSnapshotData['DATA_SOURCES'][dataSource1]['CROSS_MATCHES'][dataSource2][matchLevelCode]
             except:
                 printWithNewLines('no samples found for %s' % arg, 'B')
                 return
@@ -1359,15 +2931,20 @@ class G2CmdShell(cmd.Cmd):
                 printWithNewLines('no entities to display!', 'B')
             else:
 
+                def sampleEntities(sampleIndex, dbo):
+                    if matchLevelCode in ('MATCH_SAMPLE'):
+                        return [str(sampleRecords[sampleIndex])]
+                    return sampleEntityIds(sampleRecords[sampleIndex])
+
                 self.currentReviewList = 'CROSS SOURCE SUMMARY for: %s-%s  (%s)' % (dataSource1, dataSource2, matchLevelCode) 
+                prefetcher = self.samplePrefetcher(len(sampleRecords), sampleEntities)
                 currentSample = 0
                 while True:
 
+                    exportRecords = prefetcher.entityIds(currentSample)
                     if matchLevelCode in ('MATCH_SAMPLE'):
-                        exportRecords = [str(sampleRecords[currentSample])]
                         returnCode = self.do_get(exportRecords[0])
                     else:
-                        exportRecords = sampleRecords[currentSample].split()[:2]
                         returnCode = self.do_compare(','.join(exportRecords))
                     if returnCode != 0:
                         printWithNewLines('The statistics loaded are out of date for this entity','E')
@@ -1418,6 +2995,7 @@ class G2CmdShell(cmd.Cmd):
 
                     if reply.upper().startswith('Q'):
                         break
+                prefetcher.cancel()
                 self.currentReviewList = None
 
     # -----------------------------
@@ -1448,6 +3026,350 @@ class G2CmdShell(cmd.Cmd):
         completions = [i for i in possibles if i.startswith(arg)]
         return completions
 
+    # -----------------------------
+    def do_snapshotDiff (self,arg):
+        '\nCompares the statistics in two json files computed by pocSnapshot.py.' \
+        '\n\nSyntax:' \
+        '\n\tsnapshotDiff <before pocSnapshot json file> <after pocSnapshot json file>' \
+        '\n\nNotes: ' \
+        '\n\tShows the change in each data source and cross source statistic and how many sample entities were dropped or added.' \
+        '\n\tThe snapshot currently loaded is not replaced.\n'
+
+        argTokens = arg.split()
+        if len(argTokens) != 2:
+            print('\nMissing argument(s) for %s, command syntax: %s \n' % ('do_snapshotDiff', '\n\n' + self.do_snapshotDiff.__doc__[1:]))
+            return
+
+        for fileName in argTokens:
+            if not os.path.exists(fileName):
+                printWithNewLines('file %s not found!' % (fileName), 'B')
+                return
+
+        #--index both files at the same time, their sidecars are used if current but not built for a one off comparison
+        futureList = [runInBackground(loadStatsFile, fileName, None, self.statsCacheBytes(), False) for fileName in argTokens]
+        snapshotList = []
+        for fileName, future in zip(argTokens, futureList):
+            try: jsonData = future.result()
+            except KeyboardInterrupt:
+                printWithNewLines('snapshotDiff cancelled', 'B')
+                return
+            except ImportError as err:
+                printWithNewLines(str(err), 'B')
+                return
+            except:
+                printWithNewLines('Invalid json in %s' % fileName, 'B')
+                return
+            if jsonData.get('SOURCE') not in ('pocCalculate', 'pocSnapshot') or 'DATA_SOURCES' not in jsonData:
+                printWithNewLines('%s is not a json file created with pocSnapshot.py' % fileName, 'B')
+                return
+            snapshotList.append(jsonData['DATA_SOURCES'])
+        beforeData, afterData = snapshotList
+
+        dataSourceStats = []
+        dataSourceStats.append(['Records', 'RECORD_COUNT'])
+        dataSourceStats.append(['Entities', 'ENTITY_COUNT'])
+        dataSourceStats.append(['Compression', 'COMPRESSION'])
+        dataSourceStats.append(['Singletons', 'SINGLE_COUNT'])
+        dataSourceStats.append(['Duplicates', 'DUPLICATE_COUNT', 'DUPLICATE_ENTITY_COUNT'])
+        dataSourceStats.append(['Ambiguous', 'AMBIGUOUS_MATCH_COUNT', 'AMBIGUOUS_MATCH_ENTITY_COUNT'])
+        dataSourceStats.append(['Possibles', 'POSSIBLE_MATCH_COUNT', 'POSSIBLE_MATCH_ENTITY_COUNT'])
+        dataSourceStats.append(['Relationships', 'POSSIBLY_RELATED_COUNT', 'POSSIBLY_RELATED_ENTITY_COUNT'])
+        crossSourceStats = []
+        crossSourceStats.append(['Duplicates', 'MATCH_COUNT', 'MATCH_ENTITY_COUNT'])
+        crossSourceStats.append(['Ambiguous', 'AMBIGUOUS_MATCH_COUNT', 'AMBIGUOUS_MATCH_ENTITY_COUNT'])
+        crossSourceStats.append(['Possibles', 'POSSIBLE_MATCH_COUNT', 'POSSIBLE_MATCH_ENTITY_COUNT'])
+        crossSourceStats.append(['Relationships', 'POSSIBLY_RELATED_COUNT', 'POSSIBLY_RELATED_ENTITY_COUNT'])
+
+        dataSourceRows = []
+        crossSourceRows = []
+        sampleRows = []
+        for dataSource1 in sorted(set(beforeData) | set(afterData)):
+            beforeStats = beforeData[dataSource1] if dataSource1 in beforeData else {}
+            afterStats = afterData[dataSource1] if dataSource1 in afterData else {}
+
+            row = [dataSource1]
+            for statList in dataSourceStats:
+                row.append(fmtDelta(snapshotStat(beforeStats, statList[1:]), snapshotStat(afterStats, statList[1:])))
+            dataSourceRows.append(row)
+            sampleRows.extend(self.sampleDiffRows(dataSource1, '', beforeStats, afterStats))
+
+            beforeCross = beforeStats['CROSS_MATCHES'] if 'CROSS_MATCHES' in beforeStats else {}
+            afterCross = afterStats['CROSS_MATCHES'] if 'CROSS_MATCHES' in afterStats else {}
+            for dataSource2 in sorted(set(beforeCross) | set(afterCross)):
+                beforeStats = beforeCross[dataSource2] if dataSource2 in beforeCross else {}
+                afterStats = afterCross[dataSource2] if dataSource2 in afterCross else {}
+
+                row = [dataSource1, dataSource2]
+                for statList in crossSourceStats:
+                    row.append(fmtDelta(snapshotStat(beforeStats, statList[1:]), snapshotStat(afterStats, statList[1:])))
+                crossSourceRows.append(row)
+                sampleRows.extend(self.sampleDiffRows(dataSource1, dataSource2, beforeStats, afterStats))
+
+        tblTitle = 'Data source changes from %s to %s' % (argTokens[0], argTokens[1])
+        tblColumns = []
+        tblColumns.append({'name': 'Data Source', 'width': 25, 'align': 'center'})
+        for statList in dataSourceStats:
+            tblColumns.append({'name': statList[0], 'width': 15, 'align': 'center'})
+        self.renderTable(tblTitle, tblColumns, dataSourceRows)
+
+        if crossSourceRows:
+            tblTitle = 'Cross source changes from %s to %s' % (argTokens[0], argTokens[1])
+            tblColumns = []
+            tblColumns.append({'name': 'Data Source1', 'width': 25, 'align': 'center'})
+            tblColumns.append({'name': 'Data Source2', 'width': 25, 'align': 'center'})
+            for statList in crossSourceStats:
+                tblColumns.append({'name': statList[0], 'width': 15, 'align': 'center'})
+            self.renderTable(tblTitle, tblColumns, crossSourceRows)
+
+        if sampleRows:
+            tblTitle = 'Sample entity changes from %s to %s' % (argTokens[0], argTokens[1])
+            tblColumns = []
+            tblColumns.append({'name': 'Data Source1', 'width': 25, 'align': 'center'})
+            tblColumns.append({'name': 'Data Source2', 'width': 25, 'align': 'center'})
+            tblColumns.append({'name': 'Sample', 'width': 25, 'align': 'left'})
+            tblColumns.append({'name': 'Before', 'width': 10, 'align': 'right'})
+            tblColumns.append({'name': 'After', 'width': 10, 'align': 'right'})
+            tblColumns.append({'name': 'Dropped', 'width': 10, 'align': 'right'})
+            tblColumns.append({'name': 'Added', 'width': 10, 'align': 'right'})
+            self.renderTable(tblTitle, tblColumns, sampleRows)
+
+    # -----------------------------
+    def sampleDiffRows(self, dataSource1, dataSource2, beforeStats, afterStats):
+        #--a row per sample list that changed, each list is read with peek so it is released once compared
+
+        sampleKeys = set([key for key in beforeStats if key.endswith('_SAMPLE')]) | set([key for key in afterStats if key.endswith('_SAMPLE')])
+        tblRows = []
+        for sampleKey in sorted(sampleKeys):
+            beforeSamples = beforeStats.peek(sampleKey) if sampleKey in beforeStats else []
+            afterSamples = afterStats.peek(sampleKey) if sampleKey in afterStats else []
+            beforeCount, afterCount, droppedCount, addedCount = sampleSetDiff(beforeSamples, afterSamples)
+            if droppedCount or addedCount:
+                tblRows.append([dataSource1, dataSource2, sampleKey, fmtStatistic(beforeCount), fmtStatistic(afterCount), fmtStatistic(droppedCount), fmtStatistic(addedCount)])
+        return tblRows
+
+    # -----------------------------
+    def complete_snapshotDiff(self, text, line, begidx, endidx):
+        return self.complete_load(text, line, begidx, endidx)
+
+    # -----------------------------
+    def do_snapshot (self,arg):
+        '\nComputes the data source, cross source and entity size statistics of pocSnapshot.py directly from the database.' \
+        '\n\nSyntax:' \
+        '\n\tsnapshot <json file name>' \
+        '\n\tsnapshot <json file name> processes 8 partition 100000 samples 1000' \
+        '\n\nNotes: ' \
+        '\n\tThe resolved entity id range is split into partitions that are computed in parallel, each process with its own database connection.' \
+        '\n\tThe statistics of each partition are kept in <json file name>.partitions so refresh can recompute just the ones that changed.' \
+        '\n\tThe snapshot is loaded when it completes.\n'
+
+        if not g2Dbo:
+            printWithNewLines('Sorry a database connection is required for this function!', 'B')
+            return
+
+        argTokens = arg.split()
+        if len(argTokens) not in (1, 3, 5, 7):
+            print('\nMissing argument(s) for %s, command syntax: %s \n' % ('do_snapshot', '\n\n' + self.do_snapshot.__doc__[1:]))
+            return
+        fileName = argTokens[0]
+        snapshotOptions = {'PROCESSES': multiprocessing.cpu_count(), 'PARTITION': 100000, 'SAMPLES': 1000}
+        for i in range(1, len(argTokens), 2):
+            if argTokens[i].upper() not in snapshotOptions or not argTokens[i + 1].isdigit() or int(argTokens[i + 1]) < 1:
+                printWithNewLines('%s %s is an invalid argument' % (argTokens[i], argTokens[i + 1]), 'B')
+                return
+            snapshotOptions[argTokens[i].upper()] = int(argTokens[i + 1])
+
+        entityRange = g2Dbo.fetchNext(g2Dbo.sqlExec('select min(RES_ENT_ID) as MIN_ENTITY_ID, max(RES_ENT_ID) as MAX_ENTITY_ID from RES_ENT'))
+        if not entityRange or entityRange['MIN_ENTITY_ID'] is None:
+            printWithNewLines('No resolved entities found!', 'B')
+            return
+
+        partitionSize = snapshotOptions['PARTITION']
+        partitionList = []
+        for lowEntityId in range(int(entityRange['MIN_ENTITY_ID']), int(entityRange['MAX_ENTITY_ID']) + 1, partitionSize):
+            partitionList.append([lowEntityId, lowEntityId + partitionSize - 1])
+
+        snapshotParms = self.snapshotParameters(snapshotOptions['SAMPLES'])
+        snapshotParms['FIRST_ENTITY_ID'] = int(entityRange['MIN_ENTITY_ID'])
+        snapshotParms['PARTITION_SIZE'] = partitionSize
+        partitionFileName = fileName + '.partitions'
+        totalStats = {}
+        partitionCount = 0
+        try:
+            with open(partitionFileName, 'w') as partitionFile:
+                for lowEntityId, highEntityId, partitionStats, linkedPartitions in computeSnapshotPartitions(g2dbUri, partitionList, snapshotParms, snapshotOptions['PROCESSES']):
+                    partitionFile.write(json.dumps({'PARTITION': [lowEntityId, highEntityId], 'STATS': partitionStats, 'LINKS': linkedPartitions}) + '\n')
+                    mergeSnapshotStats(totalStats, partitionStats, snapshotParms['SAMPLE_SIZE'])
+                    partitionCount += 1
+                    sys.stdout.write('\rcomputing snapshot ... %s of %s partitions  ' % (partitionCount, len(partitionList)))
+                    sys.stdout.flush()
+        except KeyboardInterrupt:
+            printWithNewLines('\nsnapshot cancelled', 'E')
+            return
+        except Exception as err:
+            printWithNewLines('\nsnapshot failed: %s' % err, 'E')
+            return
+        print('')
+
+        snapshotParms['PARTITION_FILE'] = os.path.basename(partitionFileName)
+        snapshotParms['PARTITION_COUNT'] = len(partitionList)
+        jsonData = finishSnapshotStats(totalStats, snapshotParms)
+        with open(fileName, 'w') as f:
+            json.dump(jsonData, f)
+        self.do_load(fileName)
+
+    # -----------------------------
+    def snapshotParameters(self, sampleSize):
+        #--the config lookups the snapshot processes need as they have no shell
+
+        snapshotParms = {}
+        snapshotParms['SAMPLE_SIZE'] = sampleSize
+        snapshotParms['MAX_ENTITY_SIZE'] = 100
+        snapshotParms['DSRC_CODES'] = {}
+        for dsrcId in self.dsrcLookup:
+            snapshotParms['DSRC_CODES'][dsrcId] = self.dsrcLookup[dsrcId]['DSRC_CODE']
+        snapshotParms['ERRULE_RTYPES'] = {}
+        for erruleId in self.erruleLookup:
+            snapshotParms['ERRULE_RTYPES'][erruleId] = self.erruleLookup[erruleId].get('RTYPE_ID')
+
+        #--entities are flagged for review when they have more than one value of an exclusive feature or lots of names or addresses
+        snapshotParms['REVIEW_FTYPES'] = {}
+        for ftypeId in self.ftypeLookup:
+            if self.ftypeLookup[ftypeId].get('FTYPE_EXCL', 'No').upper().startswith('Y'):
+                snapshotParms['REVIEW_FTYPES'][ftypeId] = [self.ftypeLookup[ftypeId]['FTYPE_CODE'], 1]
+            elif self.ftypeLookup[ftypeId]['FTYPE_CODE'] in ('NAME', 'ADDRESS'):
+                snapshotParms['REVIEW_FTYPES'][ftypeId] = [self.ftypeLookup[ftypeId]['FTYPE_CODE'], 3]
+        return snapshotParms
+
+    # -----------------------------
+    def do_refresh (self,arg):
+        '\nRecomputes the loaded snapshot for just the resolved entities that changed since it was taken.' \
+        '\n\nSyntax:' \
+        '\n\trefresh <entity_id>,<entity_id>,...' \
+        '\n\trefresh <from entity_id>-<to entity_id>' \
+        '\n\trefresh 1001,1005-1010 to <json file name>' \
+        '\n\nNotes: ' \
+        '\n\tOnly the snapshot partitions holding those entities, the entities related to them now, or the entities' \
+        '\n\tthe snapshot had related to them are recomputed, so removed relationships are taken out of the counts too.' \
+        '\n\tSnapshots taken before relationship links were kept in the partitions file need a full snapshot instead.' \
+        '\n\tThe snapshot must have been computed with the snapshot command and is replaced unless saved to another file.\n'
+
+        if not argCheck('do_refresh', arg, self.do_refresh.__doc__):
+            return
+
+        if not g2Dbo:
+            printWithNewLines('Sorry a database connection is required for this function!', 'B')
+            return
+
+        if not self.waitForLoads(settingNames = ['pocSnapshotFile']):
+            return
+
+        if not self.pocSnapshotData or 'PARTITIONS' not in self.pocSnapshotData:
+            printWithNewLines('Please load a json file created with the snapshot command to use this feature', 'B')
+            return
+        partitionInfo = self.pocSnapshotData['PARTITIONS']
+        partitionFileName = os.path.join(os.path.dirname(self.pocSnapshotFile), partitionInfo['FILE_NAME'])
+        if not os.path.exists(partitionFileName):
+            printWithNewLines('file %s not found!' % (partitionFileName), 'B')
+            return
+
+        fileName = self.pocSnapshotFile
+        if ' TO ' in arg.upper():
+            fileName = arg[arg.upper().find(' TO ') + 4:].strip()
+            arg = arg[0:arg.upper().find(' TO ')]
+
+        entityRanges = []
+        for token in re.split(r'[,\s]+', arg.strip()):
+            rangeMatch = re.match(r'^(\d+)(?:-(\d+))?$', token)
+            if not rangeMatch:
+                printWithNewLines('%s is not an entity id or range of entity ids' % token, 'B')
+                return
+            entityRanges.append([int(rangeMatch.group(1)), int(rangeMatch.group(2) or rangeMatch.group(1))])
+
+        #--the other side of their relationships changes too
+        changedRangeCount = len(entityRanges)
+        relatedEntities = set()
+        for lowEntityId, highEntityId in entityRanges:
+            cursor = g2Dbo.sqlExec('select distinct REL_ENT_ID from RES_REL_EKEY where RES_ENT_ID between ? and ?', [lowEntityId, highEntityId])
+            rowData = g2Dbo.fetchNext(cursor)
+            while rowData:
+                relatedEntities.add(int(rowData['REL_ENT_ID']))
+                rowData = g2Dbo.fetchNext(cursor)
+        entityRanges.extend([[entityId, entityId] for entityId in relatedEntities])
+
+        #--which partitions had relationships into which, a relationship since removed is no longer in the database
+        firstEntityId = None
+        linkedFrom = {}
+        with open(partitionFileName) as partitionFile:
+            for partitionLine in partitionFile:
+                partitionData = json.loads(partitionLine)
+                if 'LINKS' not in partitionData:
+                    printWithNewLines('%s does not record the relationships between partitions, please take a full snapshot to refresh it' % partitionFileName, 'B')
+                    return
+                if firstEntityId is None:
+                    firstEntityId = partitionData['PARTITION'][0]
+                for linkedPartition in partitionData['LINKS']:
+                    linkedFrom.setdefault(linkedPartition, set()).add(partitionData['PARTITION'][0])
+
+        #--partitions line up with the first one in the file
+        partitionSize = partitionInfo['PARTITION_SIZE']
+        changedPartitions = set()
+        for rangeNo, (lowEntityId, highEntityId) in enumerate(entityRanges):
+            for partitionNo in range((min(lowEntityId, highEntityId) - firstEntityId) // partitionSize, (max(lowEntityId, highEntityId) - firstEntityId) // partitionSize + 1):
+                changedPartitions.add(firstEntityId + partitionNo * partitionSize)
+                if rangeNo < changedRangeCount:
+                    changedPartitions.update(linkedFrom.get(firstEntityId + partitionNo * partitionSize, set()))
+        partitionList = [[lowEntityId, lowEntityId + partitionSize - 1] for lowEntityId in sorted(changedPartitions)]
+
+        snapshotParms = self.snapshotParameters(partitionInfo['SAMPLE_SIZE'])
+        snapshotParms['FIRST_ENTITY_ID'] = firstEntityId
+        snapshotParms['PARTITION_SIZE'] = partitionSize
+        recomputedStats = {}
+        try:
+            for lowEntityId, highEntityId, partitionStats, linkedPartitions in computeSnapshotPartitions(g2dbUri, partitionList, snapshotParms, multiprocessing.cpu_count()):
+                recomputedStats[lowEntityId] = [highEntityId, partitionStats, linkedPartitions]
+                sys.stdout.write('\rrefreshing snapshot ... %s of %s partitions  ' % (len(recomputedStats), len(partitionList)))
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            printWithNewLines('\nrefresh cancelled', 'E')
+            return
+        except Exception as err:
+            printWithNewLines('\nrefresh failed: %s' % err, 'E')
+            return
+        print('')
+
+        #--merge the recomputed partitions with the unchanged ones, in partition order
+        newPartitionFileName = fileName + '.partitions'
+        recomputedList = sorted(recomputedStats)
+        totalStats = {}
+        partitionCount = 0
+        with open(partitionFileName) as oldFile, open(newPartitionFileName + '.tmp', 'w') as newFile:
+            for partitionLine in oldFile:
+                partitionData = json.loads(partitionLine)
+                while recomputedList and recomputedList[0] <= partitionData['PARTITION'][0]:
+                    lowEntityId = recomputedList.pop(0)
+                    newFile.write(json.dumps({'PARTITION': [lowEntityId, recomputedStats[lowEntityId][0]], 'STATS': recomputedStats[lowEntityId][1], 'LINKS': recomputedStats[lowEntityId][2]}) + '\n')
+                    mergeSnapshotStats(totalStats, recomputedStats[lowEntityId][1], snapshotParms['SAMPLE_SIZE'])
+                    partitionCount += 1
+                if partitionData['PARTITION'][0] in recomputedStats:
+                    continue
+                newFile.write(partitionLine if partitionLine.endswith('\n') else partitionLine + '\n')
+                mergeSnapshotStats(totalStats, partitionData['STATS'], snapshotParms['SAMPLE_SIZE'])
+                partitionCount += 1
+            for lowEntityId in recomputedList:
+                newFile.write(json.dumps({'PARTITION': [lowEntityId, recomputedStats[lowEntityId][0]], 'STATS': recomputedStats[lowEntityId][1], 'LINKS': recomputedStats[lowEntityId][2]}) + '\n')
+                mergeSnapshotStats(totalStats, recomputedStats[lowEntityId][1], snapshotParms['SAMPLE_SIZE'])
+                partitionCount += 1
+        os.replace(newPartitionFileName + '.tmp', newPartitionFileName)
+
+        snapshotParms['PARTITION_FILE'] = os.path.basename(newPartitionFileName)
+        snapshotParms['PARTITION_COUNT'] = partitionCount
+        jsonData = finishSnapshotStats(totalStats, snapshotParms)
+        with open(fileName + '.tmp', 'w') as f:
+            json.dump(jsonData, f)
+        os.replace(fileName + '.tmp', fileName)
+        printWithNewLines('%s of %s partitions recomputed' % (len(partitionList), partitionCount), 'S')
+        self.do_load(fileName)
+
     # -----------------------------
     def do_search(self,arg):
         '\nSearches for entities by their attributes.' \
@@ -1457,13 +3379,22 @@ class G2CmdShell(cmd.Cmd):
         '\n\tsearch {"name_org": "ABC Company"}' \
         '\n\tsearch {"name_last": "Smith", "name_first": "Joe", "date_of_birth": "1992-12-10"}' \
         '\n\tsearch {"name_org": "ABC Company", "addr_full": "111 First St, Anytown, USA 11111"}' \
+        '\n\tsearch file <queries.jsonl> to <results.jsonl> [threads <n>]' \
         '\n\nNotes: ' \
         '\n\tSearching by name alone may not locate a specific entity.' \
-        '\n\tTry adding a date of birth, address, or phone number if not found by name alone.\n'
+        '\n\tTry adding a date of birth, address, or phone number if not found by name alone.' \
+        '\n\tA search file has one search per line, either json or a name, and the ranked results of each are written' \
+        '\n\tto the results file followed by a summary of the search latencies.' \
+        '\n\tA search repeated within 5 minutes is answered from the search cache and marked (cached).\n'
 
         if not argCheck('do_search', arg, self.do_search.__doc__):
             return
 
+        argTokens = arg.split()
+        if len(argTokens) >= 4 and argTokens[0].upper() == 'FILE' and argTokens[2].upper() == 'TO':
+            self.searchFile(arg)
+            return
+
         try:
             parmData = dictKeysUpper(json.loads(arg)) if arg.startswith('{') else {"PERSON_NAME_FULL": arg, "ORGANIZATION_NAME_ORG": arg}
         except (ValueError, KeyError) as e:
@@ -1472,23 +3403,24 @@ class G2CmdShell(cmd.Cmd):
 
             print('')
             print('Searching ...')
+
+            #--repeated searches come from the search cache, the key is the same however the keys were ordered or cased
+            cacheKey = json.dumps(parmData, sort_keys=True)
+            self.checkCacheConfig()
+            response = self.searchCache.get(cacheKey)
+            wasCached = response is not None
             try: 
-                if oldG2Module:
-                    response = g2Engine.searchByAttributes(json.dumps(parmData))
-                else:
-                    response = bytearray()
-                    retcode = g2Engine.searchByAttributes(json.dumps(parmData), response)
-                    response = response.decode() if response else ''
+                if not wasCached:
+                    response = self.searchByAttributes(parmData)
+                    if response:
+                        self.searchCache.put(cacheKey, response)
             except G2Exception as err:
                 print(str(err))
             else:
-                jsonResponse = json.loads(response)
+                jsonResponse = jsonDecode(response)
                 #--print(response)
                 
-                #--constants for descriptions and sort orders
-                dataSourceOrder = [] #--place your data sources here!
-
-                tblTitle = 'SEARCH RESULTS'
+                tblTitle = 'SEARCH RESULTS' + (' (cached)' if wasCached else '')
                 tblColumns = []
                 tblColumns.append({'name': 'Index', 'width': 5, 'align': 'center'})
                 tblColumns.append({'name': 'Entity ID', 'width': 15, 'align': 'center'})
@@ -1497,60 +3429,13 @@ class G2CmdShell(cmd.Cmd):
                 tblColumns.append({'name': 'Match Key', 'width': 50, 'align': 'left'})
                 tblColumns.append({'name': 'Match Score', 'width': 15, 'align': 'center'})
 
-                matchList = []
-                searchIndex = 0
-                for resolvedEntity in jsonResponse['SEARCH_RESPONSE']['RESOLVED_ENTITIES']:
-                    searchIndex += 1
-
-                    #--create a list of data sources we found them in
-                    dataSources = {}
-                    for record in resolvedEntity['RECORDS']:
-                        dataSource = record['DATA_SOURCE']
-                        if dataSource not in dataSources:
-                            dataSources[dataSource] = [record['RECORD_ID']]
-                        else:
-                            dataSources[dataSource].append(record['RECORD_ID'])
-
-                    dataSourceList = []
-                    for dataSource in dataSources:
-                        if len(dataSources[dataSource]) == 1:
-                            dataSourceList.append(dataSource + ': ' + dataSources[dataSource][0])
-                        else:
-                            dataSourceList.append(dataSource + ': ' + str(len(dataSources[dataSource])) + ' records')
-
-                    #--determine the matching criteria
-                    matchLevel = self.searchMatchLevels[resolvedEntity['MATCH_LEVEL']]
-                    matchKey = resolvedEntity['MATCH_KEY'][1:] if resolvedEntity['MATCH_KEY'] else '' 
-                    nameScore = 0
-                    matchedName = ''
-                    if 'NAME' in resolvedEntity['MATCH_SCORES']:
-                        for scoreRecord in resolvedEntity['MATCH_SCORES']['NAME']:
-                            if scoreRecord['GNR_FN'] > nameScore:
-                                nameScore = scoreRecord['GNR_FN']
-                                matchedName = scoreRecord['CANDIDATE_FEAT']
-                    matchScore = str(((5-resolvedEntity['MATCH_LEVEL']) * 100) + int(resolvedEntity['MATCH_SCORE'])) + '-' + str(1000+nameScore)[-3:]
-
-                    #--create the possible match entity one-line summary
-                    row = []
-                    row.append(str(searchIndex))
-                    row.append(str(resolvedEntity['ENTITY_ID']))
-                    row.append(resolvedEntity['ENTITY_NAME'] + (('\n aka: ' + matchedName) if matchedName and matchedName != resolvedEntity['ENTITY_NAME'] else ''))
-                    row.append('\n'.join(dataSourceList))
-                    row.append(matchKey)
-                    row.append(matchScore)
-                    matchList.append(row)
+                matchList = self.searchMatchList(jsonResponse)
 
                 if len(matchList) == 0:
                     print('\tNo matches found or there were simply too many to return')
                     print('\tPlease include additional search parameters if you feel this entity is in the database')
                 else:
-
-                    #--sort the list by match score descending
-                    matchList = sorted(matchList, key=lambda x: x[5], reverse=True)
-                    self.lastSearchResult = []
-                    for i in range(len(matchList)):
-                        matchList[i][0] = str(i+1)
-                        self.lastSearchResult.append(int(matchList[i][1]))
+                    self.lastSearchResult = [int(row[1]) for row in matchList]
                     self.renderTable(tblTitle, tblColumns, matchList, 10)
 
 
@@ -1559,6 +3444,166 @@ class G2CmdShell(cmd.Cmd):
             if self.doDebug:
                 showMeTheThings(parmData)
 
+    # -----------------------------
+    def searchByAttributes(self, parmData):
+        #--the response is left for jsonDecode
+        return self.engineCall('searchByAttributes', jsonEncode(parmData))
+
+    # -----------------------------
+    def searchMatchList(self, jsonResponse):
+        #--search result rows ranked by match score
+
+        #--constants for descriptions and sort orders
+        dataSourceOrder = [] #--place your data sources here!
+
+        matchList = []
+        searchIndex = 0
+        for resolvedEntity in jsonResponse['SEARCH_RESPONSE']['RESOLVED_ENTITIES']:
+            searchIndex += 1
+
+            #--create a list of data sources we found them in
+            dataSources = {}
+            for record in resolvedEntity['RECORDS']:
+                dataSource = record['DATA_SOURCE']
+                if dataSource not in dataSources:
+                    dataSources[dataSource] = [record['RECORD_ID']]
+                else:
+                    dataSources[dataSource].append(record['RECORD_ID'])
+
+            dataSourceList = []
+            for dataSource in dataSources:
+                if len(dataSources[dataSource]) == 1:
+                    dataSourceList.append(dataSource + ': ' + dataSources[dataSource][0])
+                else:
+                    dataSourceList.append(dataSource + ': ' + str(len(dataSources[dataSource])) + ' records')
+
+            #--determine the matching criteria
+            matchLevel = self.searchMatchLevels[resolvedEntity['MATCH_LEVEL']]
+            matchKey = resolvedEntity['MATCH_KEY'][1:] if resolvedEntity['MATCH_KEY'] else '' 
+            nameScore = 0
+            matchedName = ''
+            if 'NAME' in resolvedEntity['MATCH_SCORES']:
+                for scoreRecord in resolvedEntity['MATCH_SCORES']['NAME']:
+                    if scoreRecord['GNR_FN'] > nameScore:
+                        nameScore = scoreRecord['GNR_FN']
+                        matchedName = scoreRecord['CANDIDATE_FEAT']
+            matchScore = str(((5-resolvedEntity['MATCH_LEVEL']) * 100) + int(resolvedEntity['MATCH_SCORE'])) + '-' + str(1000+nameScore)[-3:]
+
+            #--create the possible match entity one-line summary
+            row = []
+            row.append(str(searchIndex))
+            row.append(str(resolvedEntity['ENTITY_ID']))
+            row.append(resolvedEntity['ENTITY_NAME'] + (('\n aka: ' + matchedName) if matchedName and matchedName != resolvedEntity['ENTITY_NAME'] else ''))
+            row.append('\n'.join(dataSourceList))
+            row.append(matchKey)
+            row.append(matchScore)
+            matchList.append(row)
+
+        #--sort the list by match score descending
+        matchList = sorted(matchList, key=lambda x: x[5], reverse=True)
+        for i in range(len(matchList)):
+            matchList[i][0] = str(i+1)
+        return matchList
+
+    # -----------------------------
+    def searchFile(self, arg):
+        #--runs the searches of a file on a thread pool and writes their results in file order
+
+        argTokens = arg.split()
+        queryFileName = argTokens[1]
+        resultFileName = argTokens[3]
+        maxWorkers = 8
+        if len(argTokens) == 6 and argTokens[4].upper() == 'THREADS' and argTokens[5].isnumeric() and int(argTokens[5]) > 0:
+            maxWorkers = int(argTokens[5])
+        elif len(argTokens) != 4:
+            argError(arg, 'expected search file <queries.jsonl> to <results.jsonl> [threads <n>]')
+            return
+
+        def runSearch(queryLine):
+            #--the latency is the engine call alone, not the parsing or ranking
+            try:
+                parmData = dictKeysUpper(json.loads(queryLine)) if queryLine.startswith('{') else {"PERSON_NAME_FULL": queryLine, "ORGANIZATION_NAME_ORG": queryLine}
+            except (ValueError, KeyError) as err:
+                return {'ERROR': 'invalid search: %s' % err}, None
+            startTime = time.time()
+            try: response = self.searchByAttributes(parmData)
+            except G2Exception as err:
+                return {'ERROR': str(err)}, time.time() - startTime
+            latency = time.time() - startTime
+            resultList = []
+            for row in self.searchMatchList(jsonDecode(response)):
+                resultList.append({'ENTITY_ID': int(row[1]), 'MATCH_KEY': row[4], 'MATCH_SCORE': row[5]})
+            return {'RESULTS': resultList}, latency
+
+        try: queryFile = open(queryFileName)
+        except IOError as err:
+            print('cannot read %s - %s' % (queryFileName, err))
+            return
+        try: resultFile = open(resultFileName, 'w')
+        except IOError as err:
+            queryFile.close()
+            print('cannot write to %s - %s' % (resultFileName, err))
+            return
+
+        latencyList = []
+        queryCount = 0
+        errorCount = 0
+        startTime = time.time()
+        with queryFile, resultFile, concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futureQueue = deque()
+            lineNumber = 0
+            try:
+                queryLines = iter(queryFile)
+                while True:
+                    while len(futureQueue) < 2 * maxWorkers:
+                        queryLine = next(queryLines, None)
+                        if queryLine is None:
+                            break
+                        lineNumber += 1
+                        if queryLine.strip():
+                            futureQueue.append((lineNumber, queryLine.strip(), executor.submit(runSearch, queryLine.strip())))
+                    if not futureQueue:
+                        break
+
+                    lineNumber1, queryLine, future = futureQueue.popleft()
+                    resultData, latency = future.result()
+                    resultFile.write(json.dumps(dict([('LINE', lineNumber1), ('QUERY', queryLine), ('LATENCY_MS', round(1000 * latency, 1) if latency is not None else None)] + list(resultData.items()))) + '\n')
+                    queryCount += 1
+                    if latency is not None:
+                        latencyList.append(latency)
+                    if 'ERROR' in resultData:
+                        errorCount += 1
+                    if queryCount % 100 == 0:
+                        sys.stdout.write('\rsearching ... %s queries, %s queries/s  ' % (queryCount, int(queryCount / max(time.time() - startTime, 0.001))))
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                for lineNumber1, queryLine, future in futureQueue:
+                    future.cancel()
+                printWithNewLines('\nsearch file cancelled after %s queries' % queryCount, 'E')
+        elapsedSeconds = max(time.time() - startTime, 0.001)
+        print('')
+
+        latencyList.sort()
+        def percentile(pct):
+            return '%s ms' % round(1000 * latencyList[min(len(latencyList) - 1, int(len(latencyList) * pct / 100))], 1) if latencyList else ''
+
+        tblTitle = 'Search file %s' % queryFileName
+        tblColumns = []
+        tblColumns.append({'name': 'Statistic', 'width': 25, 'align': 'left'})
+        tblColumns.append({'name': 'Value', 'width': 25, 'align': 'right'})
+        tblRows = []
+        tblRows.append(['Queries', fmtStatistic(queryCount)])
+        tblRows.append(['Errors', fmtStatistic(errorCount)])
+        tblRows.append(['Threads', str(maxWorkers)])
+        tblRows.append(['Elapsed', '%s s' % round(elapsedSeconds, 1)])
+        tblRows.append(['Throughput', '%s queries/s' % round(queryCount / elapsedSeconds, 1)])
+        tblRows.append(['p50 latency', percentile(50)])
+        tblRows.append(['p95 latency', percentile(95)])
+        tblRows.append(['p99 latency', percentile(99)])
+        tblRows.append(['Max latency', '%s ms' % round(1000 * latencyList[-1], 1) if latencyList else ''])
+        self.renderTable(tblTitle, tblColumns, tblRows)
+        printWithNewLines('results written to %s' % resultFileName, 'E')
+
     # -----------------------------
     def do_get(self,arg):
 
@@ -1594,25 +3639,19 @@ class G2CmdShell(cmd.Cmd):
                 arg = str(self.lastSearchResult[int(lastToken)-1])
 
         if len(arg.split()) == 1:
+            if showDetail:
+                apiName, flags = self.entityProfile('DETAIL')
+            else:
+                apiName, flags = self.entityProfile('RECORDS' if self.currentReviewList else 'SUMMARY')
             try: 
-                if oldG2Module:
-                    response = g2Engine.getEntityByEntityID(int(arg))
-                else:
-                    response = bytearray()
-                    retcode = g2Engine.getEntityByEntityID(int(arg), response)
-                    response = response.decode() if response else ''
+                response = self.fetchEntity(apiName, arg, flags)
             except G2Exception as err:
                 printWithNewLines(str(err), 'B')
                 return -1 if calledDirect else 0
 
         elif len(arg.split()) == 2:
             try: 
-                if oldG2Module:
-                    response = g2Engine.getEntityByRecordID(arg.split()[0], arg.split()[1])
-                else:
-                    response = bytearray()
-                    retcode = g2Engine.getEntityByRecordID(arg.split()[0], arg.split()[1], response)
-                    response = response.decode() if response else ''
+                response = self.engineCall('getEntityByRecordID', arg.split()[0], arg.split()[1])
             except G2Exception as err:
                 printWithNewLines(str(err), 'B')
                 return -1 if calledDirect else 0
@@ -1621,7 +3660,7 @@ class G2CmdShell(cmd.Cmd):
             return 0
 
         if len(response) == 0:
-            printWithNewLines('0 records found %s' % response, 'B')
+            printWithNewLines('0 records found %s' % arg, 'B')
             return -1 if calledDirect else 0
         else:
             if showDetail: 
@@ -1634,7 +3673,7 @@ class G2CmdShell(cmd.Cmd):
     # -----------------------------
     def showEntitySummary(self, entityJsonStr):
 
-        resolvedJson = json.loads(str(entityJsonStr))
+        resolvedJson = jsonDecode(entityJsonStr)
 
         entityID = str(resolvedJson['RESOLVED_ENTITY']['ENTITY_ID'])
         tblTitle = 'Entity ID %s - %s' % (entityID, resolvedJson['RESOLVED_ENTITY']['ENTITY_NAME'])
@@ -1704,7 +3743,7 @@ class G2CmdShell(cmd.Cmd):
     # -----------------------------
     def showEntityDetail(self, entityJsonStr):
 
-        resolvedJson = json.loads(str(entityJsonStr))
+        resolvedJson = jsonDecode(entityJsonStr)
 
         tblTitle = 'ENTITY_ID %s - %s' % (resolvedJson['RESOLVED_ENTITY']['ENTITY_ID'], resolvedJson['RESOLVED_ENTITY']['ENTITY_NAME'])
         tblColumns = []
@@ -1784,15 +3823,18 @@ class G2CmdShell(cmd.Cmd):
             self.renderTable(tblTitle, tblColumns, relatedRecordList)
 
     # -----------------------------
-    def getAmbiguousEntitySet(self, entityID):
-        if not g2Dbo:
-            print('warning: a database connection is required to locate the ambiguous entity!')
-            return entityID
+    def getAmbiguousEntitySet(self, entityID, dbo = None):
+        if not dbo:
+            if not g2DbPool:
+                print('warning: a database connection is required to locate the ambiguous entity!')
+                return entityID
+            with g2DbPool.connection() as dbo:
+                return self.getAmbiguousEntitySet(entityID, dbo)
 
         sql1 = 'select 1 from RES_FEAT_EKEY where RES_ENT_ID = ? and FTYPE_ID = ?'
-        if g2Dbo.fetchNext(g2Dbo.sqlExec(sql1, [entityID, self.ambiguousFtypeID])):
+        if dbo.fetchNext(dbo.sqlExec(sql1, [entityID, self.ambiguousFtypeID])):
             sql2 = 'select a.REL_ENT_ID from RES_REL_EKEY a join RES_RELATE b on b.RES_REL_ID = a.RES_REL_ID where a.RES_ENT_ID = ? and b.IS_AMBIGUOUS = 1'
-            relEntityList = g2Dbo.fetchAllRows(g2Dbo.sqlExec(sql2, [entityID,]))
+            relEntityList = dbo.fetchAllRows(dbo.sqlExec(sql2, [entityID,]))
             if relEntityList:
                 entitySet = [entityID]
                 for relEntity in relEntityList:
@@ -1841,24 +3883,21 @@ class G2CmdShell(cmd.Cmd):
             printWithNewLines('%s contains no valid entities' % arg, 'B') 
             return -1 if calledDirect else 0
 
+        #--relationships are only needed to relate the entities to each other
+        apiName, flags = self.entityProfile('COMPARE' if len(entityList) > 1 else 'RECORDS')
+        try:
+            responseList = self.fetchEntities(apiName, entityList, flags)
+        except G2Exception as err:
+            printWithNewLines(str(err), 'B')
+            return -1 if calledDirect else 0
+
         compareList = []
-        for entityId in entityList:
-            try:
-                if oldG2Module: 
-                    response = g2Engine.getEntityByEntityID(int(entityId))
-                else:
-                    response = bytearray()
-                    retcode = g2Engine.getEntityByEntityID(int(entityId), response)
-                    response = response.decode() if response else ''
-            except G2Exception as err:
-                printWithNewLines(str(err), 'B')
+        for entityId, response in zip(entityList, responseList):
+            if len(response) == 0:
+                printWithNewLines('0 records found for %s' % entityId, 'B')
                 return -1 if calledDirect else 0
-            else:
-                if len(response) == 0:
-                    printWithNewLines('0 records found for %s' % entityId, 'B')
-                    return -1 if calledDirect else 0
 
-            jsonData = json.loads(response)
+            jsonData = jsonDecode(response)
 
             entityData = {}
             entityData['entityID'] = jsonData['RESOLVED_ENTITY']['ENTITY_ID']
@@ -1907,7 +3946,7 @@ class G2CmdShell(cmd.Cmd):
                         if (showDetail or not self.isInternalAttribute(item)) and item not in entityData['otherData']:
                             entityData['otherData'].append(item)
 
-            for relatedEntity in jsonData['RELATED_ENTITIES']:
+            for relatedEntity in jsonData.get('RELATED_ENTITIES', []):
                 if relatedEntity['ENTITY_ID'] in entityList:
                     entityData['crossRelations'].append('%s to %s on %s (%s)' % (self.relatedMatchLevels[relatedEntity['MATCH_LEVEL']], relatedEntity['ENTITY_ID'], relatedEntity['MATCH_KEY'][1:], relatedEntity['ERRULE_CODE']))
                 else:
@@ -2085,13 +4124,11 @@ class G2CmdShell(cmd.Cmd):
             tblColumns.append({'name': 'Internal ID', 'width': 50, 'align': 'left'})
 
             try:
-                response = bytearray()
-                retcode = g2Engine.whyEntityByEntityID(int(entityId), response)
-                response = response.decode() if response else ''
+                response = self.fetchEntity('whyEntityByEntityID', entityId)
             except G2Exception as err:
                 printWithNewLines(str(err), 'B')
                 return -1 if calledDirect else 0
-            jsonData = json.loads(response)
+            jsonData = jsonDecode(response)
             if len(jsonData['ENTITIES']) == 0:
                 printWithNewLines('0 records found for %s' % entityId, 'B')
                 return -1 if calledDirect else 0
@@ -2242,42 +4279,22 @@ class G2CmdShell(cmd.Cmd):
 
             masterFtypeList = []
             entityData = {}
-            for entityId in entityList:
+            for entityId, whyFuture, getFuture, searchFuture in self.whyNotCalls(entityList):
                 entityData[entityId] = {}
                 try:
-                    response = bytearray()
-                    retcode = g2Engine.whyEntityByEntityID(int(entityId), response)
-                    response = response.decode() if response else ''
+                    response = whyFuture.result()
                 except G2Exception as err:
                     printWithNewLines(str(err), 'B')
                     return -1 if calledDirect else 0
-                jsonData = json.loads(response)
+                jsonData = jsonDecode(response)
                 if len(jsonData['ENTITIES']) == 0:
                     printWithNewLines('0 records found for %s' % entityId, 'B')
                     return -1 if calledDirect else 0
 
-                #--add the data sources and create search json
-                searchJson = {}
+                #--add the data sources
                 entityData[entityId]['dataSources'] = []
                 for record in jsonData['ENTITIES'][0]['RESOLVED_ENTITY']['RECORDS']:
                     entityData[entityId]['dataSources'].append('%s: %s' %(record['DATA_SOURCE'], record['RECORD_ID']))
-                    if not searchJson:
-                        searchJson = record['JSON_DATA']
-                    else: #--merge the json records
-                        #searchJson = jsonMerge(searchJson, record['JSON_DATA'])
-                        rootAttributes = {}
-                        for rootAttribute in record['JSON_DATA']:
-                            if type(record['JSON_DATA'][rootAttribute]) != list:
-                                rootAttributes[rootAttribute] = record['JSON_DATA'][rootAttribute]
-                            else:
-                                if rootAttribute not in searchJson:
-                                    searchJson[rootAttribute] = []
-                                for subRecord in record['JSON_DATA'][rootAttribute]:
-                                    searchJson[rootAttribute].append(subRecord)
-                        if rootAttributes:
-                            if 'ROOT_ATTRIBUTES' not in searchJson:
-                                searchJson['ROOT_ATTRIBUTES'] = []
-                            searchJson['ROOT_ATTRIBUTES'].append(rootAttributes)
 
                 #--get info for these features from the resolved entity section
                 entityData[entityId]['features'] = {}
@@ -2301,15 +4318,13 @@ class G2CmdShell(cmd.Cmd):
 
                 #--see how this entity is related to the others
                 try: 
-                    response = bytearray()
-                    retcode = g2Engine.getEntityByEntityIDV2(int(entityId), g2Engine.G2_ENTITY_BRIEF_FORMAT, response)
-                    response = response.decode() if response else ''
+                    response = getFuture.result()
                 except G2Exception as err:
                     print(str(err))
                     return
 
                 entityData[entityId]['crossRelations'] = []
-                jsonResponse = json.loads(response)
+                jsonResponse = jsonDecode(response)
                 for relatedEntity in jsonResponse['RELATED_ENTITIES']:
                     if relatedEntity['ENTITY_ID'] in entityList:
                         relationship = {}
@@ -2319,17 +4334,14 @@ class G2CmdShell(cmd.Cmd):
                         entityData[entityId]['crossRelations'].append(relationship)
 
                 #--search for this entity to get the scores against the others
-                try: 
-                    response = bytearray()
-                    retcode = g2Engine.searchByAttributes(json.dumps(searchJson), response)
-                    response = response.decode() if response else ''
-                except G2Exception as err:
+                searchJson, response, err = searchFuture.result()
+                if err:
                     print(json.dumps(searchJson, indent=4))
                     print(str(err))
                     return
 
                 entityData[entityId]['whyKey'] = []
-                jsonResponse = json.loads(response)
+                jsonResponse = jsonDecode(response)
 
                 if debugOn:
                     print(json.dumps(jsonResponse, indent=4))
@@ -2412,6 +4424,21 @@ class G2CmdShell(cmd.Cmd):
         matchKeyRow = ['WHY RESULT']
         crossRelationsRow = ['RELATIONSHIPS']
         featureArray = {}
+
+        #--ambiguous features have no description so look them and the features they reference up for the whole table at once
+        ambiguousFeatures = {}
+        ambiguousIdList = [libFeatId for entityId in entityData for libFeatId in entityData[entityId]['features'] if entityData[entityId]['features'][libFeatId]['ftypeCode'] == 'AMBIGUOUS_ENTITY']
+        if ambiguousIdList and g2DbPool:
+            with g2DbPool.connection() as dbo:
+                ambiguousFeatures = libFeatCache.getFeatures(dbo, ambiguousIdList, withElements = True, chunkSize = self.sqlInListSize)
+                referencedIdList = []
+                for libFeature in ambiguousFeatures.values():
+                    for felemString in (libFeature['FELEM_VALUES'] or '').split('|'):
+                        if felemString.startswith('114:'):
+                            referencedIdList.append(felemString.split(':')[1])
+                if referencedIdList:
+                    ambiguousFeatures.update(libFeatCache.getFeatures(dbo, referencedIdList, chunkSize = self.sqlInListSize))
+
         for entityId in sorted(entityData.keys()):
 
             #--add the column
@@ -2514,10 +4541,9 @@ class G2CmdShell(cmd.Cmd):
                     #--BUG: AMBIGUOUS FEATURES HAVE NO DESCRIPTION SO MUST LOOK IT UP DIRECTLY
                     sortOrder = 1
                     featDesc = 'need db connection to display'
-                    if g2Dbo:
-                        cursor = g2Dbo.sqlExec('select FELEM_VALUES from LIB_FEAT where LIB_FEAT_ID = ' + str(libFeatId))
-                        rowData = g2Dbo.fetchNext(cursor)
-                        if rowData:
+                    if g2DbPool:
+                        rowData = ambiguousFeatures.get(int(libFeatId))
+                        if rowData and rowData.get('FELEM_VALUES'):
                             ambiguousReason = []
                             felemList = rowData['FELEM_VALUES'].split('|')
                             for felemString in felemList:
@@ -2534,8 +4560,7 @@ class G2CmdShell(cmd.Cmd):
                                     elif felemDict[1] == '3':
                                         ambiguousReason.append('Absent Feature')
                                 elif felemDict[0] == '114':
-                                    cursor1 = g2Dbo.sqlExec('select FEAT_DESC from LIB_FEAT where LIB_FEAT_ID = ' + str(felemDict[1]))
-                                    rowData1 = g2Dbo.fetchNext(cursor1)
+                                    rowData1 = ambiguousFeatures.get(int(felemDict[1]))
                                     if rowData1:
                                         ambiguousReason.append(rowData1['FEAT_DESC'])
                             #--make the feature description the ambiguous reason 
@@ -2572,6 +4597,110 @@ class G2CmdShell(cmd.Cmd):
 
         return 0
 
+    # -----------------------------
+    def whyNotCalls(self, entityList, maxWorkers = 20):
+        #--starts the why, brief get and search calls of every entity at once, yields them in list order
+        #--pairs are asked once with whyEntities if the engine has it, in place of the searches
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(3 * len(entityList), maxWorkers)) as executor:
+            callList = []
+            pairFutures = {}
+            for entityId in entityList:
+                whyFuture = executor.submit(self.fetchEntity, 'whyEntityByEntityID', entityId)
+                getFuture = executor.submit(self.fetchEntity, 'getEntityByEntityIDV2', entityId, g2Engine.G2_ENTITY_BRIEF_FORMAT)
+                if hasattr(g2Engine, 'whyEntities'):
+                    for entityId1 in entityList:
+                        pairKey = tuple(sorted((int(entityId), int(entityId1))))
+                        if entityId1 != entityId and pairKey not in pairFutures:
+                            pairFutures[pairKey] = executor.submit(self.fetchWhyEntities, entityId, entityId1)
+                    callList.append([entityId, whyFuture, getFuture, None])
+                else:
+                    callList.append([entityId, whyFuture, getFuture, executor.submit(self.whyNotSearch, whyFuture)])
+
+            #--submitted after every pair so the pairs they wait on are already running or done
+            for calls in callList:
+                if calls[3] is None:
+                    calls[3] = executor.submit(self.whyNotPairs, calls[0], entityList, pairFutures)
+
+            try:
+                for calls in callList:
+                    yield calls
+            finally:
+                for future in [x for calls in callList for x in calls[1:]] + list(pairFutures.values()):
+                    future.cancel()
+
+    # -----------------------------
+    def whyNotSearch(self, whyFuture):
+        #--searches on the merged records of an entity, returns the search json, response and error
+
+        #--submitted after its why call so that call is already running or done by the time this waits on it
+        jsonData = jsonDecode(whyFuture.result())
+        if len(jsonData['ENTITIES']) == 0:
+            return {}, '', None
+
+        searchJson = {}
+        for record in jsonData['ENTITIES'][0]['RESOLVED_ENTITY']['RECORDS']:
+            if not searchJson:
+                searchJson = record['JSON_DATA']
+            else: #--merge the json records
+                #searchJson = jsonMerge(searchJson, record['JSON_DATA'])
+                rootAttributes = {}
+                for rootAttribute in record['JSON_DATA']:
+                    if type(record['JSON_DATA'][rootAttribute]) != list:
+                        rootAttributes[rootAttribute] = record['JSON_DATA'][rootAttribute]
+                    else:
+                        if rootAttribute not in searchJson:
+                            searchJson[rootAttribute] = []
+                        for subRecord in record['JSON_DATA'][rootAttribute]:
+                            searchJson[rootAttribute].append(subRecord)
+                if rootAttributes:
+                    if 'ROOT_ATTRIBUTES' not in searchJson:
+                        searchJson['ROOT_ATTRIBUTES'] = []
+                    searchJson['ROOT_ATTRIBUTES'].append(rootAttributes)
+
+        try: 
+            response = self.engineCall('searchByAttributes', jsonEncode(searchJson))
+        except G2Exception as err:
+            return searchJson, '', err
+        return searchJson, response, None
+
+    # -----------------------------
+    def whyNotPairs(self, entityId, entityList, pairFutures):
+        #--the pair results of an entity shaped like whyNotSearch returns
+        resolvedEntities = []
+        for entityId1 in entityList:
+            if entityId1 == entityId:
+                continue
+            pairJson = {'ENTITY_ID': entityId, 'ENTITY_ID_2': entityId1}
+            try: response = pairFutures[tuple(sorted((int(entityId), int(entityId1))))].result()
+            except G2Exception as err:
+                return pairJson, '', err
+            jsonData = jsonDecode(response) if response else {}
+            if not jsonData.get('WHY_RESULTS'):
+                continue
+            matchInfo = jsonData['WHY_RESULTS'][0]['MATCH_INFO']
+            resolvedEntity = {}
+            resolvedEntity['ENTITY_ID'] = entityId1
+            resolvedEntity['MATCH_KEY'] = matchInfo['WHY_KEY']
+            resolvedEntity['ERRULE_CODE'] = matchInfo['WHY_ERRULE_CODE']
+            resolvedEntity['MATCH_SCORES'] = matchInfo['FEATURE_SCORES']
+            resolvedEntities.append(resolvedEntity)
+        return {}, jsonEncode({'SEARCH_RESPONSE': {'RESOLVED_ENTITIES': resolvedEntities}}), None
+
+    # -----------------------------
+    def fetchWhyEntities(self, entityId1, entityId2):
+        #--whyEntities through the entity cache, a pair is asked once whichever way round
+        pairKey = tuple(sorted((int(entityId1), int(entityId2))))
+        cacheKey = ('whyEntities', pairKey, None)
+        self.checkCacheConfig()
+        response = self.entityCache.get(cacheKey)
+        if response is not None:
+            return response
+
+        response = self.engineCall('whyEntities', pairKey[0], pairKey[1])
+        if response:
+            self.entityCache.put(cacheKey, response)
+        return response
+
     # -----------------------------
     def colorizeWhyKey(self, whyKey):
 
@@ -2628,9 +4757,7 @@ class G2CmdShell(cmd.Cmd):
         #--get the first record json from the database
         if "DATA_SOURCE" in record1json and "RECORD_ID" in record1json and len(record1json.keys()) == 2: 
             try:
-                response = bytearray()
-                retcode = g2Engine.getRecord(record1json['DATA_SOURCE'], record1json['RECORD_ID'], response)
-                response = response.decode() if response else ''
+                response = self.engineCall('getRecord', record1json['DATA_SOURCE'], record1json['RECORD_ID'])
             except G2Exception as err:
                 printWithNewLines(str(err), 'B')
                 return
@@ -2638,7 +4765,7 @@ class G2CmdShell(cmd.Cmd):
                 if len(response) == 0:
                     printWithNewLines('0 records found for %s' % entityId, 'B')
                     return
-            jsonData = json.loads(response)
+            jsonData = jsonDecode(response)
             record1json = dictKeysUpper(jsonData['JSON_DATA'])
         #--use the temp data source and entity type
         record1json['DATA_SOURCE'] = 'TRY_DSRC'
@@ -2648,9 +4775,7 @@ class G2CmdShell(cmd.Cmd):
         #--get second record json from the database
         if "DATA_SOURCE" in record2json and "RECORD_ID" in record2json and len(record2json.keys()) == 2: 
             try:
-                response = bytearray()
-                retcode = g2Engine.getRecord(record2json['DATA_SOURCE'], record2json['RECORD_ID'], response)
-                response = response.decode() if response else ''
+                response = self.engineCall('getRecord', record2json['DATA_SOURCE'], record2json['RECORD_ID'])
             except G2Exception as err:
                 printWithNewLines(str(err), 'B')
                 return
@@ -2658,7 +4783,7 @@ class G2CmdShell(cmd.Cmd):
                 if len(response) == 0:
                     printWithNewLines('0 records found for %s' % entityId, 'B')
                     return
-            jsonData = json.loads(response)
+            jsonData = jsonDecode(response)
             record2json = dictKeysUpper(jsonData['JSON_DATA'])
         #--use the temp data source and entity type
         record2json['DATA_SOURCE'] = 'TRY_DSRC'
@@ -2669,17 +4794,18 @@ class G2CmdShell(cmd.Cmd):
 
             #--add the two records
             try: 
-                retcode = g2Engine.addRecord(record1json['DATA_SOURCE'], record1json['RECORD_ID'], json.dumps(record1json))
-                retcode = g2Engine.addRecord(record2json['DATA_SOURCE'], record2json['RECORD_ID'], json.dumps(record2json))
+                self.engineCall('addRecord', record1json['DATA_SOURCE'], record1json['RECORD_ID'], jsonEncode(record1json), hasResponse = False)
+                self.engineCall('addRecord', record2json['DATA_SOURCE'], record2json['RECORD_ID'], jsonEncode(record2json), hasResponse = False)
             except G2Exception as err:
                 print(str(err))
                 return
+            finally:
+                self.entityCache.clear() #--the temporary records change entities and search results
+                self.searchCache.clear()
 
             #--get the first entity_id
             try:
-                response = bytearray()
-                retcode = g2Engine.getEntityByRecordID(record1json['DATA_SOURCE'], record1json['RECORD_ID'], response)
-                response = response.decode() if response else ''
+                response = self.engineCall('getEntityByRecordID', record1json['DATA_SOURCE'], record1json['RECORD_ID'])
             except G2Exception as err:
                 print(str(err))
                 return
@@ -2687,13 +4813,11 @@ class G2CmdShell(cmd.Cmd):
                 if len(response) == 0:
                     print('0 records found for %s %s' % (record1json['DATA_SOURCE'], record1json['RECORD_ID']))
                     return
-            entity1id = json.loads(response)['RESOLVED_ENTITY']['ENTITY_ID']
+            entity1id = jsonDecode(response)['RESOLVED_ENTITY']['ENTITY_ID']
 
             #--get the second entity_id
             try:
-                response = bytearray()
-                retcode = g2Engine.getEntityByRecordID(record2json['DATA_SOURCE'], record2json['RECORD_ID'], response)
-                response = response.decode() if response else ''
+                response = self.engineCall('getEntityByRecordID', record2json['DATA_SOURCE'], record2json['RECORD_ID'])
             except G2Exception as err:
                 print(str(err))
                 return
@@ -2701,7 +4825,7 @@ class G2CmdShell(cmd.Cmd):
                 if len(response) == 0:
                     print('0 records found for %s %s' % (record2json['DATA_SOURCE'], record2json['RECORD_ID']))
                     return
-            entity2id = json.loads(response)['RESOLVED_ENTITY']['ENTITY_ID']
+            entity2id = jsonDecode(response)['RESOLVED_ENTITY']['ENTITY_ID']
 
             #--do a why on the temporary entities
             if entity2id == entity1id:
@@ -2720,11 +4844,14 @@ class G2CmdShell(cmd.Cmd):
 
         #--delete the two temporary records 
         try: 
-            retcode = g2Engine.deleteRecord(record1json['DATA_SOURCE'], record1json['RECORD_ID'])
-            retcode = g2Engine.deleteRecord(record2json['DATA_SOURCE'], record2json['RECORD_ID'])
+            self.engineCall('deleteRecord', record1json['DATA_SOURCE'], record1json['RECORD_ID'], hasResponse = False)
+            self.engineCall('deleteRecord', record2json['DATA_SOURCE'], record2json['RECORD_ID'], hasResponse = False)
         except G2Exception as err:
             print(str(err))
             return
+        finally:
+            self.entityCache.clear()
+            self.searchCache.clear()
 
         return
 
@@ -2816,10 +4943,28 @@ class G2CmdShell(cmd.Cmd):
         '\n\nSyntax:' \
         '\n\texport <entity_id> <entity_id> ... to <fileName>' \
         '\n\texport search to <fileName>' \
-        '\n\texport search top (n)> to <fileName>\n'
+        '\n\texport search top (n)> to <fileName>' \
+        '\n\texport datasource <dataSource> to <fileName>' \
+        '\n\texport all to <fileName>' \
+        '\n\nThe file is gzip compressed if its name ends with .gz' \
+        '\nA data source or full export that is interrupted resumes where it stopped when run again.\n'
         if not argCheck('do_export', arg, self.do_export.__doc__):
             return
 
+        argTokens = arg.split() if type(arg) == str else []
+        if argTokens and argTokens[0].upper() in ('DATASOURCE', 'ALL'):
+            toIndex = [x.upper() for x in argTokens].index('TO') if 'TO' in [x.upper() for x in argTokens] else len(argTokens)
+            if argTokens[0].upper() == 'DATASOURCE' and toIndex != 2:
+                argError(arg, 'expected export datasource <dataSource> to <fileName>')
+                return
+            dataSource = argTokens[1].upper() if argTokens[0].upper() == 'DATASOURCE' else None
+            if dataSource and dataSource not in self.dsrcCodeLookup:
+                printWithNewLines('%s is not a valid data source' % dataSource, 'B')
+                return
+            fileName = ' '.join(argTokens[toIndex + 1:]) or ((dataSource.lower() if dataSource else 'all') + '.json')
+            self.exportRepository(dataSource, fileName)
+            return
+
         fileName = None
         if type(arg) == str and 'TO' in arg.upper():
             fileName = arg[arg.upper().find('TO') + 2:].strip()
@@ -2850,38 +4995,174 @@ class G2CmdShell(cmd.Cmd):
             else:
                 fileName = 'records.json'
             
-        try: f = open(fileName, 'w')
+        try: f = gzip.open(fileName, 'wb') if fileName.endswith('.gz') else open(fileName, 'wb')
         except IOError as err:
             print('cannot write to %s - %s' % (fileName, err))
             return
 
+        #--entities are fetched on a pool while this thread writes their records in list order
+        maxWorkers = 20
         recordCount = 0
-        for entityId in entityList:
+        entityCount = 0
+        startTime = time.time()
+        lastProgress = startTime
+        with f, concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futureQueue = deque()
+            entityIter = iter(entityList)
             try:
-                if oldG2Module:
-                    response = g2Engine.getEntityByEntityID(int(entityId))
-                else:
-                    response = bytearray()
-                    retcode = g2Engine.getEntityByEntityID(int(entityId), response)
-                    response = response.decode() if response else ''
-            except G2Exception as err:
-                print(str(err))
+                while True:
+                    while len(futureQueue) < 2 * maxWorkers:
+                        entityId = next(entityIter, None)
+                        if entityId is None:
+                            break
+                        futureQueue.append((entityId, executor.submit(self.exportEntityRecords, entityId)))
+                    if not futureQueue:
+                        break
+
+                    entityId, future = futureQueue.popleft()
+                    try:
+                        recordList = future.result()
+                    except G2Exception as err:
+                        print(str(err))
+                    else:
+                        if recordList is None:
+                            print('0 records found for %s' % entityId)
+                        else:
+                            for record in recordList:
+                                f.write(record + b'\n')
+                            recordCount += len(recordList)
+                    entityCount += 1
+
+                    if len(entityList) > 1 and time.time() - lastProgress >= 1:
+                        lastProgress = time.time()
+                        sys.stdout.write('\rexporting ... %s of %s entities, %s records, %s records/s  ' % (entityCount, len(entityList), recordCount, int(recordCount / (lastProgress - startTime))))
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                for entityId, future in futureQueue:
+                    future.cancel()
+                printWithNewLines('\nexport cancelled after %s of %s entities' % (entityCount, len(entityList)), 'E')
+
+        elapsedSeconds = time.time() - startTime
+        print('')
+        print('%s records written to %s' % (recordCount, fileName) + (' (%s records/s)' % int(recordCount / elapsedSeconds) if elapsedSeconds >= 1 else ''))
+        print('')
+
+    # -----------------------------
+    def exportRepository(self, dataSource, fileName, chunkSize = 10000):
+        #--streams the records to a file in observed entity id order, resuming from <fileName>.checkpoint
+        #--restarts if the file is gone, stops if it is shorter than the checkpoint
+        if not g2Dbo:
+            printWithNewLines('Sorry a database connection is required for this function!', 'B')
+            return
+
+        dsrcId = self.dsrcCodeLookup[dataSource]['DSRC_ID'] if dataSource else None
+        compressed = fileName.endswith('.gz')
+
+        sql = 'select min(OBS_ENT_ID) as MIN_OBS_ENT_ID, max(OBS_ENT_ID) as MAX_OBS_ENT_ID from OBS_ENT' + (' where DSRC_ID = ?' if dsrcId else '')
+        idRange = g2Dbo.fetchNext(g2Dbo.sqlExec(sql, [dsrcId] if dsrcId else []))
+        if not idRange or idRange['MIN_OBS_ENT_ID'] is None:
+            printWithNewLines('no records found for %s' % (dataSource or 'the repository'), 'B')
+            return
+
+        sql = 'select '
+        sql += ' b.JSON_DATA '
+        sql += 'from OBS_ENT a '
+        sql += 'join DSRC_RECORD b on b.ENT_SRC_KEY = a.ENT_SRC_KEY and b.DSRC_ID = a.DSRC_ID and b.ETYPE_ID = a.ETYPE_ID '
+        sql += 'where a.OBS_ENT_ID between ? and ? '
+        if dsrcId:
+            sql += 'and a.DSRC_ID = ? '
+        sql += 'order by a.OBS_ENT_ID'
+
+        #--resume from the checkpoint if it is for this same export
+        checkpointFileName = fileName + '.checkpoint'
+        checkpoint = {'FILE_NAME': os.path.abspath(fileName), 'DATA_SOURCE': dataSource, 'LAST_OBS_ENT_ID': int(idRange['MIN_OBS_ENT_ID']) - 1, 'RECORD_COUNT': 0, 'FILE_SIZE': 0}
+        if os.path.exists(checkpointFileName):
+            try: priorCheckpoint = json.load(open(checkpointFileName))
+            except:
+                priorCheckpoint = {}
+            if priorCheckpoint.get('FILE_NAME') != checkpoint['FILE_NAME'] or priorCheckpoint.get('DATA_SOURCE') != dataSource:
+                printWithNewLines('checkpoint %s is for a different export, starting over' % checkpointFileName, 'B')
+            elif not os.path.exists(fileName):
+                printWithNewLines('%s is missing, the %s records it had at checkpoint %s will be exported again from the start' % (fileName, priorCheckpoint['RECORD_COUNT'], checkpointFileName), 'B')
+            elif os.path.getsize(fileName) < priorCheckpoint['FILE_SIZE']:
+                #--records the checkpoint counts are missing from the file, so it is left as is for the user to decide
+                printWithNewLines('%s is %s bytes but checkpoint %s is at %s bytes, the output was truncated or replaced after the checkpoint.  Restore the file to resume, or delete %s to start the export over' % (fileName, os.path.getsize(fileName), checkpointFileName, priorCheckpoint['FILE_SIZE'], checkpointFileName), 'B')
+                return
             else:
-                if len(response) == 0:
-                    print('0 records found for %s' % entityId)
-                else:
+                checkpoint = priorCheckpoint
+                printWithNewLines('resuming export to %s after %s records' % (fileName, checkpoint['RECORD_COUNT']), 'B')
 
-                    #--add related records lists for keylines and move record_id and entity_name back into json_data
-                    resolvedData = json.loads(response)
-                    for i in range(len(resolvedData['RESOLVED_ENTITY']['RECORDS'])):
-                        f.write(json.dumps(resolvedData['RESOLVED_ENTITY']['RECORDS'][i]['JSON_DATA']) + '\n')
+        try:
+            f = open(fileName, 'r+b' if checkpoint['FILE_SIZE'] else 'wb')
+            f.truncate(checkpoint['FILE_SIZE'])
+            f.seek(checkpoint['FILE_SIZE'])
+        except IOError as err:
+            print('cannot write to %s - %s' % (fileName, err))
+            return
+
+        maxEntityId = int(idRange['MAX_OBS_ENT_ID'])
+        startCount = checkpoint['RECORD_COUNT']
+        startTime = time.time()
+        with f:
+            try:
+                while checkpoint['LAST_OBS_ENT_ID'] < maxEntityId:
+                    lowEntityId = checkpoint['LAST_OBS_ENT_ID'] + 1
+                    highEntityId = min(lowEntityId + chunkSize - 1, maxEntityId)
+
+                    #--each chunk is its own gzip member so the file can be cut back to any checkpoint
+                    chunkFile = gzip.GzipFile(fileobj=f, mode='wb') if compressed else f
+                    recordCount = 0
+                    cursor = g2Dbo.sqlExec(sql, [lowEntityId, highEntityId, dsrcId] if dsrcId else [lowEntityId, highEntityId])
+                    rowData = g2Dbo.fetchNext(cursor)
+                    while rowData:
+                        jsonData = rowData['JSON_DATA']
+                        if '\n' in jsonData:
+                            jsonData = jsonEncode(jsonDecode(jsonData))
+                        chunkFile.write((jsonData + '\n').encode('utf-8'))
                         recordCount += 1
-        f.close
+                        rowData = g2Dbo.fetchNext(cursor)
+                    if compressed:
+                        chunkFile.close()
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    checkpoint['LAST_OBS_ENT_ID'] = highEntityId
+                    checkpoint['RECORD_COUNT'] += recordCount
+                    checkpoint['FILE_SIZE'] = f.tell()
+                    with open(checkpointFileName + '.tmp', 'w') as checkpointFile:
+                        json.dump(checkpoint, checkpointFile)
+                    os.replace(checkpointFileName + '.tmp', checkpointFileName)
+
+                    elapsedSeconds = max(time.time() - startTime, 0.001)
+                    percent = 100 * (highEntityId - int(idRange['MIN_OBS_ENT_ID']) + 1) // (maxEntityId - int(idRange['MIN_OBS_ENT_ID']) + 1)
+                    sys.stdout.write('\rexporting %s ... %s%%, %s records, %s records/s  ' % (dataSource or 'all', percent, checkpoint['RECORD_COUNT'], int((checkpoint['RECORD_COUNT'] - startCount) / elapsedSeconds)))
+                    sys.stdout.flush()
+            except KeyboardInterrupt:
+                printWithNewLines('\nexport interrupted after %s records, run it again to resume' % checkpoint['RECORD_COUNT'], 'E')
+                return
+            except Exception as err:
+                printWithNewLines('\nexport failed after %s records: %s, run it again to resume' % (checkpoint['RECORD_COUNT'], err), 'E')
+                return
 
+        os.remove(checkpointFileName)
         print('')
-        print('%s records written to %s' % (recordCount, fileName))
+        print('%s records written to %s' % (checkpoint['RECORD_COUNT'], fileName))
         print('')
 
+    # -----------------------------
+    def exportEntityRecords(self, entityId):
+        #--the json records of an entity as utf-8 bytes, None if it has none
+        #--called directly rather than through fetchEntity so an export does not evict the entities being reviewed from the cache
+        apiName, flags = self.entityProfile('EXPORT')
+        if flags is None:
+            response = self.engineCall(apiName, int(entityId))
+        else:
+            response = self.engineCall(apiName, int(entityId), flags)
+        if len(response) == 0:
+            return None
+        resolvedData = jsonDecode(response)
+        return [jsonEncode(record['JSON_DATA'], asBytes=True) for record in resolvedData['RESOLVED_ENTITY']['RECORDS']]
+
     # -----------------------------
     def getRuleDesc(self, erruleCode):
         return ('RULE ' + str(self.erruleCodeLookup[erruleCode]['ERRULE_ID']) + ': ' + erruleCode  if erruleCode in self.erruleCodeLookup else '')
@@ -2992,9 +5273,347 @@ def printWithNewLines(ln, pos=''):
     else:
         print(ln)
 
+def loadStatsFile(fileName, progress = None, cacheMaxBytes = 0, buildCache = True):
+    #--indexes a pocSnapshot or pocAudit json file or opens its current sidecar if cacheMaxBytes is set
+    #--a missing sidecar is built in the background after the index is returned if buildCache is set
+    if progress is None:
+        progress = {}
+    progress.update({'phase': 'opening', 'done': 0, 'total': os.path.getsize(fileName)})
+
+    statsCache = StatsFileCache(fileName) if sqlite3 and cacheMaxBytes else None
+    if statsCache:
+        try: jsonData = statsCache.open()
+        except sqlite3.Error:
+            jsonData = None
+        if jsonData is not None:
+            return jsonData
+
+    progress['phase'] = 'indexing'
+    jsonData = JsonIndexScanner(StatsFileSource(fileName), progress=progress).scan()
+
+    if statsCache and buildCache:
+        runInBackground(statsCache.build, statsCache.outline(jsonData), cacheMaxBytes)
+    return jsonData
+
+def statsCacheDir():
+    return os.path.join(os.path.expanduser("~"), '.' + os.path.basename(sys.argv[0].lower().replace('.py','')) + '_cache')
+
+def runInBackground(function, *args):
+    #--runs a function on a daemon thread so it never holds up exit, returns a future for its result
+    future = concurrent.futures.Future()
+
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try: future.set_result(function(*args))
+        except BaseException as err:
+            future.set_exception(err)
+
+    thread = threading.Thread(target=runner)
+    thread.daemon = True
+    thread.start()
+    return future
+
+def isSampleListKey(key, parentKey):
+    #--the snapshot lists that hold entity ids or "id1 id2" entity pairs
+    return key == 'SAMPLE_ENTITIES' or parentKey == 'REVIEW_REASONS' or (type(key) == str and key.endswith('_SAMPLE'))
+
+def compactSampleList(sampleList):
+    #--entity ids become an int array and "id1 id2" strings an EntityPairArray
+    if not sampleList:
+        return sampleList
+    try:
+        if all(type(sample) == int for sample in sampleList):
+            typeCode = 'i' if max(sampleList) < 2**31 and min(sampleList) >= -2**31 else 'q'
+            return array(typeCode, sampleList)
+        if all(type(sample) == str for sample in sampleList):
+            firstIds = array('q')
+            secondIds = array('q')
+            for sample in sampleList:
+                entityIds = sample.split()
+                firstIds.append(int(entityIds[0]))
+                secondIds.append(int(entityIds[1]))
+            if max(firstIds) < 2**31 and max(secondIds) < 2**31 and min(firstIds) >= 0 and min(secondIds) >= 0:
+                firstIds = array('i', firstIds)
+                secondIds = array('i', secondIds)
+            return EntityPairArray(firstIds, secondIds)
+    except (ValueError, IndexError, OverflowError):
+        pass
+    return sampleList
+
+def sampleEntityIds(sample):
+    #--the two entity ids of a sample pair as strings, compact or not
+    if type(sample) == str:
+        return sample.split()[:2]
+    return [str(entityId) for entityId in sample]
+
+def sampleKey(sample):
+    #--hashable form of a sample so "id1 id2" strings and compact pairs compare equal
+    if type(sample) == str:
+        try: entityIds = tuple(int(entityId) for entityId in sample.split()[:2])
+        except ValueError: return sample
+        return entityIds[0] if len(entityIds) == 1 else entityIds
+    return tuple(sample) if type(sample) in (list, tuple) else sample
+
+def sampleSetDiff(beforeSamples, afterSamples):
+    #--distinct counts before and after and how many were dropped and added
+    beforeSet = set(sampleKey(sample) for sample in beforeSamples)
+    afterSet = set()
+    addedCount = 0
+    for sample in afterSamples:
+        thisKey = sampleKey(sample)
+        if thisKey not in afterSet:
+            afterSet.add(thisKey)
+            if thisKey not in beforeSet:
+                addedCount += 1
+    droppedCount = len(beforeSet) - (len(afterSet) - addedCount)
+    return len(beforeSet), len(afterSet), droppedCount, addedCount
+
+def snapshotStat(statData, statKeys):
+    #--older snapshots used the _ENTITY_COUNT names
+    for statKey in statKeys:
+        if statKey in statData:
+            return statData[statKey]
+    return 0
+
+def fmtDelta(before, after):
+    #--the later statistic followed by its change from the earlier one
+    try: change = int(after) - int(before)
+    except (TypeError, ValueError):
+        return str(after) if str(after) == str(before) else '%s -> %s' % (before, after)
+    if change == 0:
+        return fmtStatistic(after)
+    return '%s (%s%s)' % (fmtStatistic(after), '+' if change > 0 else '-', fmtStatistic(abs(change)))
+
+def addSnapshotSample(statData, statName, sample, sampleSize):
+    #--counts a sample and keeps it while there is room in its list
+    statData[statName + '_COUNT'] = statData.get(statName + '_COUNT', 0) + 1
+    sampleList = statData.setdefault(statName + '_SAMPLE', [])
+    if len(sampleList) < sampleSize:
+        sampleList.append(sample)
+
+def addSnapshotEntity(snapshotStats, entityId, entityRecords, reviewReasons, snapshotParms):
+    #--adds a resolved entity's data sources and size to the statistics
+    sampleSize = snapshotParms['SAMPLE_SIZE']
+    entitySize = sum(entityRecords.values())
+    snapshotStats['TOTAL_ENTITY_COUNT'] = snapshotStats.get('TOTAL_ENTITY_COUNT', 0) + 1
+    snapshotStats['TOTAL_RECORD_COUNT'] = snapshotStats.get('TOTAL_RECORD_COUNT', 0) + entitySize
+
+    for dataSource in entityRecords:
+        dataSourceStats = snapshotStats.setdefault('DATA_SOURCES', {}).setdefault(dataSource, {})
+        dataSourceStats['RECORD_COUNT'] = dataSourceStats.get('RECORD_COUNT', 0) + entityRecords[dataSource]
+        dataSourceStats['ENTITY_COUNT'] = dataSourceStats.get('ENTITY_COUNT', 0) + 1
+        if entitySize == 1:
+            addSnapshotSample(dataSourceStats, 'SINGLE', entityId, sampleSize)
+        elif entityRecords[dataSource] > 1:
+            addSnapshotSample(dataSourceStats, 'DUPLICATE', entityId, sampleSize)
+        for dataSource2 in entityRecords:
+            if dataSource2 != dataSource:
+                addSnapshotSample(dataSourceStats.setdefault('CROSS_MATCHES', {}).setdefault(dataSource2, {}), 'MATCH', entityId, sampleSize)
+
+    entitySizeStats = snapshotStats.setdefault('ENTITY_SIZE_BREAKDOWN', {}).setdefault(str(min(entitySize, snapshotParms['MAX_ENTITY_SIZE'])), {})
+    entitySizeStats['ENTITY_COUNT'] = entitySizeStats.get('ENTITY_COUNT', 0) + 1
+    sampleList = entitySizeStats.setdefault('SAMPLE_ENTITIES', [])
+    if len(sampleList) < sampleSize:
+        sampleList.append(entityId)
+    if reviewReasons and entitySize > 1:
+        entitySizeStats['REVIEW_COUNT'] = entitySizeStats.get('REVIEW_COUNT', 0) + 1
+        sampleList = entitySizeStats.setdefault('REVIEW_REASONS', {}).setdefault('+'.join(sorted(reviewReasons)), [])
+        if len(sampleList) < sampleSize:
+            sampleList.append(entityId)
+
+def snapshotPartition(taskArgs):
+    #--the statistics of one range of resolved entity ids on its own database connection
+    #--plus the first entity id of every other partition its relationships point to
+    dbUri, lowEntityId, highEntityId, snapshotParms = taskArgs
+    partitionStats = {'TOTAL_RECORD_COUNT': 0, 'TOTAL_ENTITY_COUNT': 0, 'DATA_SOURCES': {}, 'ENTITY_SIZE_BREAKDOWN': {}}
+    linkedPartitions = set()
+    sampleSize = snapshotParms['SAMPLE_SIZE']
+
+    dbo = G2Database(dbUri)
+    try:
+
+        #--review reasons from the features each entity has too many values for
+        reviewReasons = {}
+        if snapshotParms['REVIEW_FTYPES']:
+            sql = 'select RES_ENT_ID, FTYPE_ID, count(distinct LIB_FEAT_ID) as FEAT_COUNT '
+            sql += 'from RES_FEAT_EKEY '
+            sql += 'where RES_ENT_ID between ? and ? and FTYPE_ID in (%s) ' % ','.join([str(int(x)) for x in snapshotParms['REVIEW_FTYPES']])
+            sql += 'group by RES_ENT_ID, FTYPE_ID '
+            sql += 'having count(distinct LIB_FEAT_ID) > 1'
+            cursor = dbo.sqlExec(sql, [lowEntityId, highEntityId])
+            rowData = dbo.fetchNext(cursor)
+            while rowData:
+                ftypeCode, maxValues = snapshotParms['REVIEW_FTYPES'][rowData['FTYPE_ID']]
+                if rowData['FEAT_COUNT'] > maxValues:
+                    reviewReasons.setdefault(rowData['RES_ENT_ID'], []).append(ftypeCode)
+                rowData = dbo.fetchNext(cursor)
+
+        #--record counts by data source, streamed one entity at a time
+        sql = 'select a.RES_ENT_ID, c.DSRC_ID, count(*) as RECORD_COUNT '
+        sql += 'from RES_ENT_OKEY a '
+        sql += 'join OBS_ENT b on b.OBS_ENT_ID = a.OBS_ENT_ID '
+        sql += 'join DSRC_RECORD c on c.ENT_SRC_KEY = b.ENT_SRC_KEY and c.DSRC_ID = b.DSRC_ID and c.ETYPE_ID = b.ETYPE_ID '
+        sql += 'where a.RES_ENT_ID between ? and ? '
+        sql += 'group by a.RES_ENT_ID, c.DSRC_ID '
+        sql += 'order by a.RES_ENT_ID'
+        cursor = dbo.sqlExec(sql, [lowEntityId, highEntityId])
+        entityId = None
+        entityRecords = {}
+        rowData = dbo.fetchNext(cursor)
+        while True:
+            if entityId is not None and (not rowData or rowData['RES_ENT_ID'] != entityId):
+                addSnapshotEntity(partitionStats, entityId, entityRecords, reviewReasons.get(entityId), snapshotParms)
+                entityRecords = {}
+            if not rowData:
+                break
+            entityId = rowData['RES_ENT_ID']
+            dataSource = snapshotParms['DSRC_CODES'].get(rowData['DSRC_ID'], str(rowData['DSRC_ID']))
+            entityRecords[dataSource] = entityRecords.get(dataSource, 0) + rowData['RECORD_COUNT']
+            rowData = dbo.fetchNext(cursor)
+
+        #--relationships by the data sources on each side
+        sql = 'select distinct a.RES_ENT_ID, c.DSRC_ID as DSRC_ID1, a.REL_ENT_ID, e.DSRC_ID as DSRC_ID2, b.LAST_ERRULE_ID, b.IS_AMBIGUOUS '
+        sql += 'from RES_REL_EKEY a '
+        sql += 'join RES_RELATE b on b.RES_REL_ID = a.RES_REL_ID '
+        sql += 'join RES_ENT_OKEY d on d.RES_ENT_ID = a.RES_ENT_ID '
+        sql += 'join OBS_ENT c on c.OBS_ENT_ID = d.OBS_ENT_ID '
+        sql += 'join RES_ENT_OKEY f on f.RES_ENT_ID = a.REL_ENT_ID '
+        sql += 'join OBS_ENT e on e.OBS_ENT_ID = f.OBS_ENT_ID '
+        sql += 'where a.RES_ENT_ID between ? and ? '
+        sql += 'order by a.RES_ENT_ID'
+        cursor = dbo.sqlExec(sql, [lowEntityId, highEntityId])
+        entityId = None
+        statsCounted = set()
+        rowData = dbo.fetchNext(cursor)
+        while rowData:
+            if rowData['RES_ENT_ID'] != entityId:
+                entityId = rowData['RES_ENT_ID']
+                statsCounted = set()
+
+            #--the partitions on the other side, refresh recomputes this one when they change even if the relationship is gone
+            linkedPartition = snapshotParms['FIRST_ENTITY_ID'] + (int(rowData['REL_ENT_ID']) - snapshotParms['FIRST_ENTITY_ID']) // snapshotParms['PARTITION_SIZE'] * snapshotParms['PARTITION_SIZE']
+            if linkedPartition != lowEntityId:
+                linkedPartitions.add(linkedPartition)
+            if rowData['IS_AMBIGUOUS'] and int(rowData['IS_AMBIGUOUS']) == 1:
+                statName = 'AMBIGUOUS_MATCH'
+            elif snapshotParms['ERRULE_RTYPES'].get(rowData['LAST_ERRULE_ID']) == 2:
+                statName = 'POSSIBLE_MATCH'
+            elif snapshotParms['ERRULE_RTYPES'].get(rowData['LAST_ERRULE_ID']) in (3, 4):
+                statName = 'POSSIBLY_RELATED'
+            else:
+                statName = None #--disclosed relationships are not part of the snapshot
+
+            dataSource1 = snapshotParms['DSRC_CODES'].get(rowData['DSRC_ID1'], str(rowData['DSRC_ID1']))
+            dataSource2 = snapshotParms['DSRC_CODES'].get(rowData['DSRC_ID2'], str(rowData['DSRC_ID2']))
+            if statName and (dataSource1, dataSource2, statName) not in statsCounted:
+                statsCounted.add((dataSource1, dataSource2, statName))
+                dataSourceStats = partitionStats['DATA_SOURCES'].setdefault(dataSource1, {})
+                if dataSource2 != dataSource1:
+                    dataSourceStats = dataSourceStats.setdefault('CROSS_MATCHES', {}).setdefault(dataSource2, {})
+                addSnapshotSample(dataSourceStats, statName, '%s %s' % (entityId, rowData['REL_ENT_ID']), sampleSize)
+            rowData = dbo.fetchNext(cursor)
+
+    finally:
+        dbo.close()
+
+    return lowEntityId, highEntityId, partitionStats, sorted(linkedPartitions)
+
+def computeSnapshotPartitions(dbUri, partitionList, snapshotParms, processCount):
+    #--yields (lowEntityId, highEntityId, partitionStats, linkedPartitions) in partition order
+    taskList = [(dbUri, partition[0], partition[1], snapshotParms) for partition in partitionList]
+    if processCount <= 1 or len(taskList) <= 1:
+        for taskArgs in taskList:
+            yield snapshotPartition(taskArgs)
+        return
+    workerPool = multiprocessing.Pool(min(processCount, len(taskList)))
+    try:
+        for partitionResult in workerPool.imap(snapshotPartition, taskList):
+            yield partitionResult
+        workerPool.close()
+    finally:
+        workerPool.terminate()
+        workerPool.join()
+
+def mergeSnapshotStats(totalStats, partitionStats, sampleSize):
+    #--adds the counts of a partition to the totals and tops up the sample lists
+    for statName in partitionStats:
+        statValue = partitionStats[statName]
+        if type(statValue) == dict:
+            mergeSnapshotStats(totalStats.setdefault(statName, {}), statValue, sampleSize)
+        elif type(statValue) == list:
+            sampleList = totalStats.setdefault(statName, [])
+            sampleList.extend(statValue[:max(0, sampleSize - len(sampleList))])
+        else:
+            totalStats[statName] = totalStats.get(statName, 0) + statValue
+
+def finishSnapshotStats(totalStats, snapshotParms):
+    #--shapes the merged statistics like a pocSnapshot.py json file
+    jsonData = OrderedDict()
+    jsonData['SOURCE'] = 'pocSnapshot'
+    jsonData['SNAPSHOT_TIME'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    jsonData['PARTITIONS'] = {'FILE_NAME': snapshotParms.get('PARTITION_FILE'), 'PARTITION_SIZE': snapshotParms.get('PARTITION_SIZE'), 'PARTITION_COUNT': snapshotParms.get('PARTITION_COUNT'), 'SAMPLE_SIZE': snapshotParms['SAMPLE_SIZE']}
+    jsonData['TOTAL_RECORD_COUNT'] = totalStats.get('TOTAL_RECORD_COUNT', 0)
+    jsonData['TOTAL_ENTITY_COUNT'] = totalStats.get('TOTAL_ENTITY_COUNT', 0)
+
+    jsonData['DATA_SOURCES'] = {}
+    for dataSource in sorted(totalStats.get('DATA_SOURCES', {})):
+        dataSourceStats = totalStats['DATA_SOURCES'][dataSource]
+        for statName in ('RECORD_COUNT', 'ENTITY_COUNT'):
+            dataSourceStats.setdefault(statName, 0)
+        for statName in ('SINGLE', 'DUPLICATE', 'AMBIGUOUS_MATCH', 'POSSIBLE_MATCH', 'POSSIBLY_RELATED'):
+            dataSourceStats.setdefault(statName + '_COUNT', 0)
+            dataSourceStats.setdefault(statName + '_SAMPLE', [])
+        if dataSourceStats['RECORD_COUNT']:
+            dataSourceStats['COMPRESSION'] = '%.2f%%' % (100 * (1 - dataSourceStats['ENTITY_COUNT'] / dataSourceStats['RECORD_COUNT']))
+        else:
+            dataSourceStats['COMPRESSION'] = '0%'
+        for dataSource2 in dataSourceStats.setdefault('CROSS_MATCHES', {}):
+            for statName in ('MATCH', 'AMBIGUOUS_MATCH', 'POSSIBLE_MATCH', 'POSSIBLY_RELATED'):
+                dataSourceStats['CROSS_MATCHES'][dataSource2].setdefault(statName + '_COUNT', 0)
+                dataSourceStats['CROSS_MATCHES'][dataSource2].setdefault(statName + '_SAMPLE', [])
+        jsonData['DATA_SOURCES'][dataSource] = dataSourceStats
+
+    jsonData['ENTITY_SIZE_BREAKDOWN'] = []
+    for entitySize in sorted(totalStats.get('ENTITY_SIZE_BREAKDOWN', {}), key=lambda k: int(k)):
+        entitySizeStats = totalStats['ENTITY_SIZE_BREAKDOWN'][entitySize]
+        entitySizeData = OrderedDict()
+        entitySizeData['ENTITY_SIZE'] = int(entitySize)
+        entitySizeData['ENTITY_SIZE_DISPLAY'] = entitySize + ('+' if int(entitySize) == snapshotParms['MAX_ENTITY_SIZE'] else '')
+        entitySizeData['ENTITY_COUNT'] = entitySizeStats.get('ENTITY_COUNT', 0)
+        entitySizeData['REVIEW_COUNT'] = entitySizeStats.get('REVIEW_COUNT', 0)
+        entitySizeData['REVIEW_REASONS'] = entitySizeStats.get('REVIEW_REASONS', {})
+        entitySizeData['SAMPLE_ENTITIES'] = entitySizeStats.get('SAMPLE_ENTITIES', [])
+        jsonData['ENTITY_SIZE_BREAKDOWN'].append(entitySizeData)
+    return jsonData
+
+def jsonItemCount(jsonObject, key):
+    #--length of a member list without parsing it when the loader already knows it
+    if isinstance(jsonObject, LazyJsonObject):
+        return jsonObject.itemCount(key)
+    return len(jsonObject[key])
+
 def dictKeysUpper(dict):
     return {k.upper():v for k,v in dict.items()}
 
+def jsonDecode(jsonData):
+    #--parses a string or the bytearray an engine call filled in, with orjson if installed
+    startTime = time.time()
+    try:
+        if hasOrjson:
+            return orjson.loads(jsonData)
+        return json.loads(jsonData)
+    finally:
+        engineStats.recordJson(time.time() - startTime, len(jsonData))
+
+def jsonEncode(jsonData, asBytes = False):
+    #--compact json as a string or as utf-8 bytes, with orjson if installed
+    if hasOrjson:
+        jsonBytes = orjson.dumps(jsonData, option=orjson.OPT_NON_STR_KEYS)
+        return jsonBytes if asBytes else jsonBytes.decode('utf-8')
+    jsonString = json.dumps(jsonData, ensure_ascii=False)
+    return jsonString.encode('utf-8') if asBytes else jsonString
+
 def showMeTheThings(data, loc=''):
     printWithNewLines('<---- DEBUG')
     printWithNewLines('Func: %s' % sys._getframe(1).f_code.co_name)
@@ -3098,6 +5717,9 @@ if __name__ == '__main__':
         g2Dbo = False
         #sys.exit(1)
 
+    #--worker threads take their own connections from here instead of sharing g2Dbo
+    g2DbPool = G2DatabasePool(g2dbUri) if g2Dbo else None
+
 
     #--use config file if in the ini file, otherwise expect to get from database with config manager lib
     try: configTableFile = iniParser.get('SQL', 'G2CONFIGFILE')
@@ -3185,5 +5807,7 @@ if __name__ == '__main__':
     except: pass
     try: g2Dbo.close()
     except: pass
+    try: g2DbPool.close()
+    except: pass
 
     sys.exit()
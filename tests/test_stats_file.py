@@ -0,0 +1,266 @@
+#! /usr/bin/env python3
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try: import poc_viewer
+except SystemExit:
+    raise unittest.SkipTest('poc_viewer needs prettytable and the Senzing python classes on the PYTHONPATH')
+
+try: import zstandard
+except ImportError:
+    zstandard = None
+
+#--strings that put escapes, brackets and quotes wherever a chunk boundary can fall
+awkwardStrings = ['plain', 'quote " inside', 'back\\slash', 'ends with backslash\\', '\\"', '] bracket [', '{ brace }', 'comma, inside', 'tab\tnew\nline', 'unicode é中', '']
+
+def statsFileData():
+    jsonData = {'SOURCE': 'pocSnapshot', 'TOTAL_RECORD_COUNT': 12, 'NOTE': 'a "quoted" \\ note', 'EMPTY_OBJECT': {}, 'DATA_SOURCES': {}}
+    for dsrcNo in range(3):
+        jsonData['DATA_SOURCES']['DS%s' % dsrcNo] = {
+            'RECORD_COUNT': dsrcNo * 1000,
+            'COMPRESSION': '12.5%',
+            'SINGLE_SAMPLE': list(range(dsrcNo * 2500)),
+            'DUPLICATE_SAMPLE': [],
+            'POSSIBLE_MATCH_SAMPLE': ['%s %s' % (i, i + 1) for i in range(dsrcNo * 700)],
+            'AMBIGUOUS_MATCH_SAMPLE': [-1, 2**40, 0],
+            'CROSS_MATCHES': {'DS%s' % i: {'MATCH_COUNT': i, 'MATCH_SAMPLE': [i] * i} for i in range(3)},
+            'NOTES': awkwardStrings * (dsrcNo + 1),
+            'NESTED': [[1, [2, []]], [], [[]], ['a]', ['b[']]],
+            'MIXED': [1, 'two', 3.5, True, False, None, {'OBJECT': ['in', 'a', 'list']}],
+        }
+    jsonData['ENTITY_SIZE_BREAKDOWN'] = [{'ENTITY_SIZE': size, 'ENTITY_COUNT': 10, 'REVIEW_REASONS': {'NAME': [size, size + 1]} if size % 2 else {}, 'SAMPLE_ENTITIES': list(range(size * 3))} for size in range(1, 6)]
+    jsonData['EMPTY_LIST'] = []
+    return jsonData
+
+def plain(value):
+    #--the statistics as python types, undoing the compact sample lists
+    if isinstance(value, poc_viewer.LazyJsonObject):
+        return {key: plain(value[key]) for key in value}
+    if isinstance(value, poc_viewer.EntityPairArray):
+        return ['%s %s' % pair for pair in value]
+    if type(value) == tuple:
+        return '%s %s' % value
+    if isinstance(value, (list, poc_viewer.array, poc_viewer.PagedJsonList)):
+        return [plain(item) for item in value]
+    return value
+
+# ==============================
+class JsonIndexScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.jsonData = statsFileData()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def writeFile(self, fileName, indent = None):
+        jsonBytes = json.dumps(self.jsonData, indent=indent).encode('utf-8')
+        fileName = os.path.join(self.tempDir, fileName)
+        if fileName.endswith('.gz'):
+            with gzip.open(fileName, 'wb') as f:
+                f.write(jsonBytes)
+        elif fileName.endswith('.zst'):
+            with open(fileName, 'wb') as f:
+                f.write(zstandard.ZstdCompressor().compress(jsonBytes))
+        else:
+            with open(fileName, 'wb') as f:
+                f.write(jsonBytes)
+        return fileName
+
+    def scan(self, fileName, chunkSize = 4194304):
+        return poc_viewer.JsonIndexScanner(poc_viewer.StatsFileSource(fileName), chunkSize).scan()
+
+    def test_plain_file(self):
+        fileName = self.writeFile('snapshot.json')
+        self.assertEqual(plain(self.scan(fileName)), json.load(open(fileName)))
+
+    def test_indented_file(self):
+        fileName = self.writeFile('snapshot.json', indent=4)
+        self.assertEqual(plain(self.scan(fileName)), json.load(open(fileName)))
+
+    def test_gzip_file(self):
+        fileName = self.writeFile('snapshot.json.gz')
+        self.assertEqual(plain(self.scan(fileName)), json.load(gzip.open(fileName)))
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd_file(self):
+        fileName = self.writeFile('snapshot.json.zst')
+        self.assertEqual(plain(self.scan(fileName)), self.jsonData)
+
+    def test_every_chunk_boundary(self):
+        #--chunks this small put a boundary inside every escape, string and number of the file
+        for indent in (None, 1):
+            fileName = self.writeFile('snapshot.json', indent=indent)
+            for chunkSize in (1, 2, 3, 7, 64):
+                self.assertEqual(plain(self.scan(fileName, chunkSize)), self.jsonData, 'chunkSize %s' % chunkSize)
+
+    def test_item_counts(self):
+        fileName = self.writeFile('snapshot.json')
+        for chunkSize in (1, 5, 4194304):
+            jsonData = self.scan(fileName, chunkSize)
+            for dataSource in self.jsonData['DATA_SOURCES']:
+                for key in self.jsonData['DATA_SOURCES'][dataSource]:
+                    if type(self.jsonData['DATA_SOURCES'][dataSource][key]) == list:
+                        self.assertEqual(poc_viewer.jsonItemCount(jsonData['DATA_SOURCES'][dataSource], key), len(self.jsonData['DATA_SOURCES'][dataSource][key]))
+
+    def test_invalid_file(self):
+        fileName = os.path.join(self.tempDir, 'truncated.json')
+        with open(fileName, 'wb') as f:
+            f.write(json.dumps(self.jsonData).encode('utf-8')[:-100])
+        with self.assertRaises(ValueError):
+            self.scan(fileName, 16)
+
+# ==============================
+class StatsFileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.priorHome = os.environ.get('HOME')
+        os.environ['HOME'] = self.tempDir
+        self.jsonData = statsFileData()
+        self.fileName = os.path.join(self.tempDir, 'snapshot.json.gz')
+        with gzip.open(self.fileName, 'wb') as f:
+            f.write(json.dumps(self.jsonData).encode('utf-8'))
+
+    def tearDown(self):
+        if self.priorHome is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.priorHome
+        shutil.rmtree(self.tempDir)
+
+    def buildCache(self, maxBytes = 1073741824):
+        statsCache = poc_viewer.StatsFileCache(self.fileName)
+        statsCache.build(statsCache.outline(poc_viewer.loadStatsFile(self.fileName)), maxBytes)
+        return statsCache
+
+    def test_round_trip(self):
+        self.buildCache()
+        cachedData = poc_viewer.StatsFileCache(self.fileName).open()
+        self.assertIsInstance(cachedData, poc_viewer.CachedJsonObject)
+        self.assertEqual(plain(cachedData), self.jsonData)
+        self.assertEqual(poc_viewer.jsonItemCount(cachedData['DATA_SOURCES']['DS2'], 'SINGLE_SAMPLE'), 5000)
+
+    def test_outline_ignores_browsing(self):
+        #--lists parsed after the load are still written from the file
+        jsonData = poc_viewer.loadStatsFile(self.fileName)
+        statsCache = poc_viewer.StatsFileCache(self.fileName)
+        outline = statsCache.outline(jsonData)
+        jsonData['DATA_SOURCES']['DS2']['POSSIBLE_MATCH_SAMPLE']
+        statsCache.build(outline, 1073741824)
+        self.assertEqual(plain(poc_viewer.StatsFileCache(self.fileName).open()), self.jsonData)
+
+    def test_concurrent_page_reads(self):
+        #--the review loop and the prefetch worker read one list while its pages are evicted under them
+        self.buildCache()
+        sampleList = poc_viewer.StatsFileCache(self.fileName).open()['DATA_SOURCES']['DS2']['SINGLE_SAMPLE']
+        sampleList.pagesKept = 1
+        errorList = []
+
+        def readPages(step):
+            try:
+                for i in range(2000):
+                    index = (i * step) % len(sampleList)
+                    if sampleList[index] != index:
+                        errorList.append('item %s is %s' % (index, sampleList[index]))
+            except Exception as err:
+                errorList.append(repr(err))
+
+        #--switching threads as often as possible makes an unguarded page cache fail within a few reads
+        priorInterval = sys.getswitchinterval()
+        sys.setswitchinterval(0.000001)
+        try:
+            threadList = [threading.Thread(target=readPages, args=(step,)) for step in (997, 1009, 1499, 2503)]
+            for thread in threadList:
+                thread.start()
+            for thread in threadList:
+                thread.join()
+        finally:
+            sys.setswitchinterval(priorInterval)
+        self.assertEqual(errorList, [])
+
+    def test_stale_cache(self):
+        self.buildCache()
+        with gzip.open(self.fileName, 'wb') as f:
+            f.write(json.dumps({'SOURCE': 'pocSnapshot', 'CHANGED': True}).encode('utf-8'))
+        os.utime(self.fileName, (0, 0))
+        self.assertIsNone(poc_viewer.StatsFileCache(self.fileName).open())
+
+    def test_size_bound(self):
+        statsCache = self.buildCache(maxBytes=1)
+        self.assertFalse(os.path.exists(statsCache.cacheFileName))
+
+# ==============================
+class SnapshotDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.priorHome = os.environ.get('HOME')
+        os.environ['HOME'] = self.tempDir
+        self.fileNames = []
+        for fileNo in range(2):
+            jsonData = statsFileData()
+            for dataSource in jsonData['DATA_SOURCES']:
+                jsonData['DATA_SOURCES'][dataSource]['SINGLE_SAMPLE'] = jsonData['DATA_SOURCES'][dataSource]['SINGLE_SAMPLE'][fileNo:]
+            self.fileNames.append(os.path.join(self.tempDir, 'snapshot%s.json' % fileNo))
+            with open(self.fileNames[-1], 'w') as f:
+                json.dump(jsonData, f)
+
+    def tearDown(self):
+        if self.priorHome is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.priorHome
+        shutil.rmtree(self.tempDir)
+
+    def diffSamples(self, beforeData, afterData):
+        #--the sample comparisons of the snapshotDiff command
+        sampleRows = []
+        for dataSource in beforeData['DATA_SOURCES']:
+            beforeStats = beforeData['DATA_SOURCES'][dataSource]
+            afterStats = afterData['DATA_SOURCES'][dataSource]
+            sampleRows.extend(poc_viewer.G2CmdShell.sampleDiffRows(None, dataSource, '', beforeStats, afterStats))
+            for dataSource2 in beforeStats['CROSS_MATCHES']:
+                sampleRows.extend(poc_viewer.G2CmdShell.sampleDiffRows(None, dataSource, dataSource2, beforeStats['CROSS_MATCHES'][dataSource2], afterStats['CROSS_MATCHES'][dataSource2]))
+        return sampleRows
+
+    def residentLists(self, value):
+        #--the sample lists still held in memory, parsed or as sidecar pages
+        residentCount = 0
+        if isinstance(value, poc_viewer.LazyJsonObject):
+            for key in value._members:
+                residentCount += self.residentLists(value._members[key])
+        elif type(value) == list:
+            for item in value:
+                residentCount += self.residentLists(item)
+        elif isinstance(value, poc_viewer.PagedJsonList):
+            residentCount += 1 if value.pages else 0
+        elif isinstance(value, (poc_viewer.array, poc_viewer.EntityPairArray)):
+            residentCount += 1
+        return residentCount
+
+    def test_lists_released_without_sidecar(self):
+        snapshotList = [poc_viewer.loadStatsFile(fileName) for fileName in self.fileNames]
+        self.assertEqual(len(self.diffSamples(*snapshotList)), 2)
+        self.assertEqual([self.residentLists(jsonData) for jsonData in snapshotList], [0, 0])
+
+    def test_pages_released_with_sidecar(self):
+        for fileName in self.fileNames:
+            statsCache = poc_viewer.StatsFileCache(fileName)
+            statsCache.build(statsCache.outline(poc_viewer.loadStatsFile(fileName)), 1073741824)
+        snapshotList = [poc_viewer.loadStatsFile(fileName, None, 1073741824, False) for fileName in self.fileNames]
+        self.assertIsInstance(snapshotList[0], poc_viewer.CachedJsonObject)
+        self.assertEqual(len(self.diffSamples(*snapshotList)), 2)
+        self.assertEqual([self.residentLists(jsonData) for jsonData in snapshotList], [0, 0])
+
+if __name__ == '__main__':
+    unittest.main()